@@ -0,0 +1,78 @@
+"""Асинхронные представления горячих маршрутов чтения для ASGI.
+
+Django 3.2 не умеет выполнять запросы ORM, обращения к кешу и
+представления DRF асинхронно. Синхронные представления под ASGI Django
+выполняет в одном общем потоке, поэтому запросы процесса к БД
+выстраиваются в очередь. Здесь представление DRF со всей его логикой
+(аутентификация, права, кеш ответов, условные запросы) и отрисовка ответа
+выполняются в пуле из ASYNC_VIEW_THREADS потоков, а цикл событий тем
+временем обслуживает остальные соединения. Размер пула ограничивает число
+одновременных обращений процесса к БД.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from foodgram.profiling import timed
+
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS, thread_name_prefix='orm'
+)
+
+
+def call_in_request(func, *args, **kwargs):
+    """Вызывает func как обработку запроса: соединения потока с БД
+    проверяются и закрываются по CONN_MAX_AGE, как в начале и в конце
+    обычного запроса.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """Выполняет func в пуле потоков с переменными контекста текущего
+    запроса (например, выбранной репликой БД).
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor,
+        partial(context.run, call_in_request, func, *args, **kwargs),
+    )
+
+
+def render_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render'):
+        timed('render', response.render)
+    return response
+
+
+def async_view(view):
+    """Асинхронная обёртка над представлением DRF."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_executor(
+            render_view, view, request, *args, **kwargs
+        )
+
+    return wrapper
+
+
+tag_list = async_view(TagViewSet.as_view({'get': 'list'}))
+ingredient_list = async_view(IngredientViewSet.as_view({'get': 'list'}))
+recipe_detail = async_view(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
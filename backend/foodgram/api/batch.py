@@ -0,0 +1,88 @@
+"""Выполнение пакета запросов к API внутри одного HTTP-запроса.
+
+Каждый вложенный запрос разрешается по маршрутам api/urls.py и
+передаётся представлению в том же процессе. Вложенные запросы получают
+заголовки исходного и уже определённого пользователя, поэтому
+аутентификация выполняется один раз на весь пакет.
+"""
+import io
+import json
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+API_NAMESPACE = 'api'
+BATCH_ROUTE = 'batch'
+# Заголовки ответа, которые передаются клиенту в ответе на пакет.
+FORWARDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Location')
+
+
+def build_subrequest(request, method, path, body=None):
+    """HttpRequest для вложенного запроса на основе исходного запроса."""
+    url = urlsplit(path)
+    content = b'' if body is None else json.dumps(body).encode()
+    subrequest = HttpRequest()
+    subrequest.META = {
+        key: value for key, value in request.META.items()
+        if not key.startswith('HTTP_IF_')
+    }
+    subrequest.META.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+    })
+    subrequest.method = method
+    subrequest.path = subrequest.path_info = url.path
+    subrequest.GET = QueryDict(url.query)
+    subrequest._stream = io.BytesIO(content)
+    subrequest._read_started = False
+    subrequest._force_auth_user = request.user
+    subrequest._force_auth_token = request.auth
+    return subrequest
+
+
+def response_body(response):
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(content) if content else None
+    return content.decode(response.charset)
+
+
+def dispatch(request, method, path, body=None):
+    """Выполняет вложенный запрос и возвращает его статус, заголовки и
+    тело. Пути вне api/urls.py и вложенные пакеты не выполняются.
+    """
+    subrequest = build_subrequest(request, method, path, body)
+    try:
+        # Вложенные запросы выполняются синхронно, в том числе под ASGI.
+        match = resolve(subrequest.path_info, settings.ROOT_URLCONF)
+    except Resolver404:
+        match = None
+    if (
+        match is None or API_NAMESPACE not in match.namespaces
+        or match.url_name == BATCH_ROUTE
+    ):
+        return {
+            'status': 404,
+            'headers': {},
+            'body': {'errors': 'Маршрут не найден.'},
+        }
+    subrequest.resolver_match = match
+    response = match.func(subrequest, *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return {
+        'status': response.status_code,
+        'headers': {
+            header: response[header]
+            for header in FORWARDED_HEADERS if response.has_header(header)
+        },
+        'body': response_body(response),
+    }
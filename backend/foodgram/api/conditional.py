@@ -0,0 +1,101 @@
+"""Условные GET-запросы (If-None-Match / If-Modified-Since).
+
+Перед выполнением list и retrieve представление считает валидаторы
+дешёвым запросом (например, время последнего изменения и количество
+отобранных рецептов) и версиями данных связанных моделей
+(recipes.versions). Если клиент прислал совпадающие ETag или дату, ответ
+304 отдаётся без выборки объектов и сериализации. ETag учитывает
+текущего пользователя и формат ответа, так как от них зависит тело.
+
+Если версия какой-то из моделей сменилась меньше
+DATABASE_REPLICA_STICKY_SECONDS назад, валидаторы и ответ читаются из
+основной БД: иначе клиент мог бы получить из отстающей реплики старое
+тело с новым ETag и получать на него 304 до следующего изменения.
+"""
+import hashlib
+from calendar import timegm
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import (get_conditional_response, patch_vary_headers,
+                                quote_etag)
+from django.utils.http import http_date
+
+from foodgram.replicas import primary_reads
+from recipes.versions import get_versions, version_time
+
+
+class ConditionalGetMixin:
+    """Поддержка условных запросов для list и retrieve.
+
+    Представление задаёт conditional_versioned_models - модели, изменение
+    которых меняет ответ, и при необходимости переопределяет
+    list_validators и retrieve_validators. Валидаторы - пара из значения,
+    от которого считается ETag, и времени последнего изменения или None.
+    """
+
+    conditional_versioned_models = ()
+
+    def list_validators(self, request):
+        return None, None
+
+    def retrieve_validators(self, request):
+        return None, None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_validators, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.retrieve_validators, super().retrieve,
+            request, *args, **kwargs
+        )
+
+    def conditional_response(self, validators, handler, request, *args,
+                             **kwargs):
+        versions = get_versions(*self.conditional_versioned_models)
+        changed = [version_time(version) for version in versions]
+        recent = timezone.now() - timedelta(
+            seconds=settings.DATABASE_REPLICA_STICKY_SECONDS
+        )
+        reads = (
+            primary_reads() if any(
+                time and time > recent for time in changed
+            ) else nullcontext()
+        )
+        with reads:
+            return self.versioned_response(
+                versions, changed, validators(request), handler,
+                request, *args, **kwargs
+            )
+
+    def versioned_response(self, versions, changed, validators, handler,
+                           request, *args, **kwargs):
+        value, last_modified = validators
+        etag = quote_etag(hashlib.md5(repr((
+            value, versions, request.user.pk,
+            request.accepted_renderer.format,
+        )).encode()).hexdigest())
+        last_modified = max(
+            filter(None, [last_modified, *changed]),
+            default=None,
+        )
+        timestamp = (
+            timegm(last_modified.utctimetuple()) if last_modified else None
+        )
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, ('Authorization',))
+        return response
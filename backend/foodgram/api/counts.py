@@ -0,0 +1,92 @@
+"""Подсчёт общего количества объектов для постраничного вывода.
+
+Точный COUNT(*) по отфильтрованному запросу кешируется. Ключ кеша
+строится из SQL запроса с параметрами и версий данных моделей, от
+которых зависит результат (recipes.versions): любое изменение этих
+моделей меняет ключ, и старое значение больше не используется. Для
+запросов без фильтров по большим таблицам PostgreSQL количество берётся
+из статистики планировщика (pg_class.reltuples) без обхода таблицы.
+Настройки задаются атрибутами представления:
+
+count_versioned_models - модели, от которых зависит количество; если
+не заданы, количество не кешируется;
+count_estimate - можно ли отдавать оценку вместо точного значения.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import QuerySet
+
+from recipes.versions import get_versions
+
+KEY_PREFIX = 'count'
+
+
+def estimate_count(queryset):
+    """Оценка количества строк таблицы по статистике PostgreSQL или None,
+    если оценка неприменима к запросу.
+    """
+    query = queryset.query
+    connection = connections[queryset.db]
+    if (
+        connection.vendor != 'postgresql' or query.where or query.distinct
+        or query.low_mark or query.high_mark is not None
+    ):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return row[0] if row and row[0] >= 0 else None
+
+
+class Counter:
+    """Считает количество объектов запроса и запоминает, точное ли оно."""
+
+    def __init__(self, versioned_models=(), estimate=False):
+        self.versioned_models = versioned_models
+        self.estimate = estimate
+        self.exact = True
+
+    @classmethod
+    def for_view(cls, view):
+        return cls(
+            getattr(view, 'count_versioned_models', ()),
+            getattr(view, 'count_estimate', False),
+        )
+
+    def cache_key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(
+            repr((sql, params, get_versions(*self.versioned_models)))
+            .encode()
+        ).hexdigest()
+        return f'{KEY_PREFIX}:{queryset.model._meta.label_lower}:{digest}'
+
+    def __call__(self, queryset):
+        if not isinstance(queryset, QuerySet):
+            return len(queryset)
+        if queryset.query.is_empty():
+            return 0
+        if self.estimate:
+            estimate = estimate_count(queryset)
+            if (
+                estimate is not None
+                and estimate >= settings.PAGINATION_ESTIMATE_THRESHOLD
+            ):
+                self.exact = False
+                return estimate
+        if not self.versioned_models:
+            return queryset.count()
+        key = self.cache_key(queryset)
+        count = cache.get(key)
+        if count is None:
+            # Значение сохраняется под текущими версиями, реплика может
+            # отставать от них.
+            count = queryset.using(DEFAULT_DB_ALIAS).count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
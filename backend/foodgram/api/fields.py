@@ -3,6 +3,8 @@ import base64
 from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from recipes.images import derivative_urls
+
 
 class Base64ImageField(serializers.ImageField):
     """Сериализация изображений."""
@@ -15,3 +17,27 @@ class Base64ImageField(serializers.ImageField):
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
 
         return super().to_internal_value(data)
+
+
+class ImageDerivativeField(serializers.Field):
+    """Ссылки на уменьшенную копию изображения рецепта в форматах WebP и
+    JPEG. Пока копии не созданы, значение null.
+    """
+
+    def __init__(self, derivative, **kwargs):
+        self.derivative = derivative
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image or not recipe.has_image_derivatives:
+            return None
+        request = self.context.get('request')
+        urls = derivative_urls(recipe.image.name, self.derivative)
+        if request is None:
+            return urls
+        return {
+            extension: request.build_absolute_uri(url)
+            for extension, url in urls.items()
+        }
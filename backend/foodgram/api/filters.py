@@ -1,26 +1,77 @@
 import django_filters
-from django.contrib.auth import get_user_model
-from rest_framework import filters
+from django import forms
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef
 
-from recipes.models import Recipe, Tag
+from recipes.models import Favorite, Recipe, RecipeTag, ShoppingCart, Tag
+from recipes.versions import get_version
 
-User = get_user_model()
+
+class TagSlugs:
+    """Соответствие slug - id тегов в памяти процесса. Загружается заново
+    из основной БД, когда меняется версия данных модели Tag (см.
+    recipes.versions).
+    """
+
+    def __init__(self):
+        self._state = (None, {})
+
+    def ids(self):
+        version = get_version(Tag)
+        current, slugs = self._state
+        if version != current:
+            slugs = dict(
+                Tag.objects.using(DEFAULT_DB_ALIAS).values_list('slug', 'id')
+            )
+            self._state = (version, slugs)
+        return slugs
+
+    def choices(self):
+        return [(slug, slug) for slug in self.ids()]
+
+
+tag_slugs = TagSlugs()
 
 
 class RecipeFilter(django_filters.FilterSet):
-    """Фильтр для рецептов по тегам и автору."""
+    """Фильтр для рецептов по тегам, автору, избранному и списку покупок.
+    Каждый фильтр добавляет условие EXISTS или сравнение по индексируемому
+    полю без соединения таблиц, поэтому строки рецептов не дублируются и
+    DISTINCT не нужен. Фильтры объединяются по И.
+    """
 
-    tags = django_filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_slugs.choices, method='filter_tags'
+    )
+    author = django_filters.NumberFilter(field_name='author_id')
+    is_favorited = django_filters.BooleanFilter(
+        method='filter_user_relation', widget=forms.TextInput
     )
-    author = django_filters.ModelChoiceFilter(queryset=User.objects.all())
+    is_in_shopping_cart = django_filters.BooleanFilter(
+        method='filter_user_relation', widget=forms.TextInput
+    )
+
+    USER_RELATIONS = {
+        'is_favorited': Favorite,
+        'is_in_shopping_cart': ShoppingCart,
+    }
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
 
+    def filter_tags(self, queryset, name, slugs):
+        ids = tag_slugs.ids()
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[ids[slug] for slug in slugs if slug in ids],
+        )))
 
-class IngredientSearchFilter(filters.SearchFilter):
-    search_param = 'name'
+    def filter_user_relation(self, queryset, name, value):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none() if value else queryset
+        related = Exists(self.USER_RELATIONS[name].objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ))
+        return queryset.filter(related if value else ~related)
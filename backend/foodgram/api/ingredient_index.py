@@ -0,0 +1,104 @@
+"""Индекс каталога ингредиентов в памяти процесса для автодополнения.
+
+Каталог небольшой и меняется редко, поэтому он целиком загружается при
+первом обращении и хранится отсортированным по названию в нижнем
+регистре. Поиск по началу названия выполняется двоичным поиском без
+обращения к БД. Отдельно хранятся хвосты названий, начинающиеся со
+второго и следующих слов, для поиска по началу слова. Индекс
+перестраивается по основной БД, когда меняется версия данных модели
+Ingredient (см. recipes.versions).
+"""
+import re
+import threading
+from bisect import bisect_left
+
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+MAX_CHAR = chr(0x10FFFF)
+WORD_START_RE = re.compile(r'(?<=\W)\w')
+
+
+def normalize(value):
+    return value.strip().casefold()
+
+
+class IndexState:
+    """Неизменяемый снимок индекса, заменяется целиком при перестройке."""
+
+    def __init__(self, rows):
+        self.rows = sorted(
+            rows,
+            key=lambda row: (
+                normalize(row['name']), row['measurement_unit'], row['id']
+            ),
+        )
+        self.keys = [normalize(row['name']) for row in self.rows]
+        words = sorted(
+            (key[match.start():], position)
+            for position, key in enumerate(self.keys)
+            for match in WORD_START_RE.finditer(key)
+        )
+        self.word_keys = [word for word, _ in words]
+        self.word_rows = [self.rows[position] for _, position in words]
+        self.by_id = {row['id']: row for row in self.rows}
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._state = IndexState([])
+
+    def _current(self):
+        version = get_version(Ingredient)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._state = IndexState(
+                        Ingredient.objects.using(DEFAULT_DB_ALIAS).values(
+                            'id', 'name', 'measurement_unit'
+                        )
+                    )
+                    self._version = version
+        return self._state
+
+    @staticmethod
+    def _range(keys, prefix):
+        start = bisect_left(keys, prefix)
+        return start, bisect_left(keys, prefix + MAX_CHAR, start)
+
+    def search(self, prefix=''):
+        """Ингредиенты, название которых начинается с prefix."""
+        state = self._current()
+        prefix = normalize(prefix)
+        if not prefix:
+            return list(state.rows)
+        start, end = self._range(state.keys, prefix)
+        return state.rows[start:end]
+
+    def search_words(self, prefix):
+        """Ингредиенты, у которых с prefix начинается не первое слово."""
+        state = self._current()
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start, end = self._range(state.word_keys, prefix)
+        found = {}
+        for row in state.word_rows[start:end]:
+            found.setdefault(row['id'], row)
+        return sorted(
+            found.values(),
+            key=lambda row: (normalize(row['name']), row['id']),
+        )
+
+    def get(self, ids):
+        """Ингредиенты с указанными id в порядке перечисления."""
+        state = self._current()
+        return [state.by_id[pk] for pk in ids if pk in state.by_id]
+
+
+ingredient_index = IngredientIndex()
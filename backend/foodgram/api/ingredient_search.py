@@ -0,0 +1,112 @@
+"""Ранжированный поиск ингредиентов с учётом опечаток.
+
+Сначала идут ингредиенты, название которых начинается с запроса, затем
+те, у которых с запроса начинается одно из следующих слов, затем
+похожие по триграммам. Первые две группы берутся из индекса в памяти,
+третья - из GIN-индекса pg_trgm на PostgreSQL или из таблицы
+IngredientTrigram на остальных СУБД. Схожесть считается как с названием
+целиком, так и с отдельными словами названия, берётся большая.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import CharField, Count, FloatField, Func, Q, Value
+from django.db.models.functions import Greatest
+from django.db.models.lookups import PostgresOperatorLookup
+
+from .ingredient_index import ingredient_index, normalize
+from recipes.models import Ingredient, IngredientTrigram
+from recipes.trigrams import similarity, trigrams, uses_pg_trgm
+
+# Во сколько раз больше кандидатов по общим триграммам отбирается в БД,
+# чем нужно вернуть, перед точным подсчётом схожести.
+CANDIDATES_FACTOR = 5
+
+
+@CharField.register_lookup
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """name %> 'запрос': в названии есть слово, похожее на запрос."""
+
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        super().__init__(Value(string), expression, **extra)
+
+
+def similar_pg(query, limit, threshold):
+    return list(
+        Ingredient.objects.filter(
+            Q(name__trigram_similar=query)
+            | Q(name__trigram_word_similar=query)
+        ).annotate(
+            similarity=Greatest(
+                TrigramSimilarity('name', query),
+                TrigramWordSimilarity(query, 'name'),
+            )
+        ).filter(
+            similarity__gte=threshold
+        ).order_by('-similarity', 'name').values_list('id', flat=True)[:limit]
+    )
+
+
+def name_similarity(query, query_grams, name):
+    """Схожесть запроса с названием целиком, а для запроса из одного
+    слова - ещё и с каждым словом названия.
+    """
+    parts = [name]
+    if len(query.split()) == 1:
+        parts.extend(name.split())
+    return max(similarity(query_grams, trigrams(part)) for part in parts)
+
+
+def similar_trigram_table(query, limit, threshold):
+    query_grams = trigrams(query)
+    if not query_grams:
+        return []
+    candidates = IngredientTrigram.objects.filter(
+        trigram__in=query_grams
+    ).values('ingredient_id').annotate(
+        shared=Count('id')
+    ).order_by('-shared').values_list(
+        'ingredient_id', flat=True
+    )[:limit * CANDIDATES_FACTOR]
+    scored = []
+    for row in ingredient_index.get(candidates):
+        score = name_similarity(query, query_grams, row['name'])
+        if score >= threshold:
+            scored.append((-score, normalize(row['name']), row['id']))
+    return [pk for _, _, pk in sorted(scored)[:limit]]
+
+
+def ranked_search(query, limit=None):
+    """Не более limit ингредиентов, наиболее подходящих под запрос."""
+    limit = min(
+        limit or settings.INGREDIENT_SEARCH_LIMIT,
+        settings.INGREDIENT_SEARCH_MAX_LIMIT,
+    )
+    query = normalize(query)
+    if not query:
+        return []
+    results = {}
+    for row in ingredient_index.search(query):
+        results.setdefault(row['id'], row)
+        if len(results) >= limit:
+            return list(results.values())
+    for row in ingredient_index.search_words(query):
+        results.setdefault(row['id'], row)
+        if len(results) >= limit:
+            return list(results.values())
+
+    similar = similar_pg if uses_pg_trgm() else similar_trigram_table
+    for row in ingredient_index.get(
+        similar(query, limit, settings.INGREDIENT_SEARCH_SIMILARITY)
+    ):
+        results.setdefault(row['id'], row)
+        if len(results) >= limit:
+            break
+    return list(results.values())
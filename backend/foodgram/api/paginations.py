@@ -1,6 +1,97 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+from functools import partial
+
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+from .counts import Counter
+
+MAX_PAGE_SIZE = 100
+
+
+class CountingPaginator(Paginator):
+    """Paginator, получающий общее количество объектов от Counter."""
+
+    def __init__(self, object_list, per_page, counter, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        return self.counter(self.object_list)
 
 
 class PageNumberPaginationLimit(PageNumberPagination):
+    """Нумерованные страницы. Общее количество считается по настройкам
+    представления (см. api.counts), поле count_exact сообщает, точное
+    оно или оценочное.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.counter = Counter.for_view(view)
+        self.django_paginator_class = partial(
+            CountingPaginator, counter=self.counter
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_exact', self.counter.exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_exact'] = {'type': 'boolean'}
+        return response_schema
+
+
+class CursorPaginationLimit(CursorPagination):
+    """Постраничный вывод по ключу: следующая страница выбирается условием
+    id < последний id предыдущей, без OFFSET и COUNT(*), поэтому любая
+    страница стоит столько же, сколько первая.
+    """
+
     page_size = 6
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = '-id'
+
+
+class PageNumberOrCursorPagination(BasePagination):
+    """По умолчанию нумерованные страницы, с параметром cursor (для первой
+    страницы пустым) - постраничный вывод по ключу со ссылками next и
+    previous вместо номера страницы и общего количества.
+    """
+
+    cursor_query_param = CursorPaginationLimit.cursor_query_param
+
+    def __init__(self):
+        self.paginator = PageNumberPaginationLimit()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.paginator = CursorPaginationLimit()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            *PageNumberPaginationLimit().get_schema_operation_parameters(view),
+            CursorPaginationLimit().get_schema_operation_parameters(view)[0],
+        ]
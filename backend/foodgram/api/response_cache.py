@@ -0,0 +1,69 @@
+"""Кеш ответов публичных списков.
+
+Данные ответа (результат сериализации) хранятся в кеше Django. Ключ
+строится из адреса запроса со строкой параметров, формата ответа и
+версий данных моделей, от которых зависит ответ (recipes.versions):
+сигналы save/delete этих моделей меняют версию, и устаревшие записи
+больше не читаются, а со временем вытесняются. Настройки задаются
+атрибутами представления:
+
+response_cache_versioned_models - модели, от которых зависит ответ;
+response_cache_actions - действия, ответы которых кешируются.
+
+Ответы, зависящие от пользователя, не кешируются: представление
+определяет это в методе response_cache_allowed.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from foodgram.replicas import primary_reads
+from recipes.versions import get_versions
+
+KEY_PREFIX = 'response'
+
+
+class ResponseCacheMixin:
+    """Отдаёт сохранённые данные ответа вместо выборки и сериализации."""
+
+    response_cache_versioned_models = ()
+    response_cache_actions = ('list',)
+
+    def response_cache_allowed(self, request):
+        return True
+
+    def response_cache_key(self, request):
+        digest = hashlib.md5(repr((
+            request.build_absolute_uri(),
+            request.accepted_renderer.format,
+            get_versions(*self.response_cache_versioned_models),
+        )).encode()).hexdigest()
+        return f'{KEY_PREFIX}:{self.basename}:{self.action}:{digest}'
+
+    def dispatch_cached(self, handler, request, *args, **kwargs):
+        if (
+            self.action not in self.response_cache_actions
+            or not self.response_cache_allowed(request)
+        ):
+            return handler(request, *args, **kwargs)
+        key = self.response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        # Ответ сохраняется под текущими версиями, реплика может отставать
+        # от них.
+        with primary_reads():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.dispatch_cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.dispatch_cached(
+            super().retrieve, request, *args, **kwargs
+        )
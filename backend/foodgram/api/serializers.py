@@ -1,17 +1,22 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.validators import UniqueValidator
 
-from .fields import Base64ImageField
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from foodgram.profiling import ProfiledSerializerMixin
+
+from .fields import Base64ImageField, ImageDerivativeField
+from .viewer import get_viewer
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingListIngredient, Tag, UserStats)
 
 User = get_user_model()
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(ProfiledSerializerMixin, UserSerializer):
     """Сериализатор модели User."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -25,13 +30,13 @@ class CustomUserSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         """Вычисление значения поля is_subscribed."""
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.follower.filter(author=obj.id).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_viewer(self.context).is_subscribed(obj)
 
 
-class CustomUserCreateSerializer(UserCreateSerializer):
+class CustomUserCreateSerializer(ProfiledSerializerMixin,
+                                 UserCreateSerializer):
     """Сериализатор модели User для создания пользователя."""
     email = serializers.EmailField(
         validators=[
@@ -54,7 +59,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         }
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Сериализация тегов."""
 
     class Meta:
@@ -62,7 +67,8 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализация ингредиентов. """
 
     class Meta:
@@ -70,7 +76,8 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(ProfiledSerializerMixin,
+                                 serializers.ModelSerializer):
     """Сериализация модели RecipeIngredient, для отображения в рецептах
     количества ингредиентов.
     """
@@ -86,7 +93,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для просмотра рецептов, с перечнем ингредиентов и тегов."""
 
     author = CustomUserSerializer(read_only=True)
@@ -95,6 +102,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         many=True, source='recipeingredients', read_only=True
     )
     image = Base64ImageField()
+    image_thumbnail = ImageDerivativeField('thumbnail')
+    image_card = ImageDerivativeField('card')
+    image_detail = ImageDerivativeField('detail')
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
 
@@ -103,11 +113,14 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time',
+            'name', 'image', 'image_thumbnail', 'image_card',
+            'image_detail', 'text', 'cooking_time',
         )
 
     def get_is_favorited(self, obj):
         """Вычисление значения поля is_favorited."""
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
@@ -115,13 +128,16 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def get_is_in_shopping_cart(self, obj):
         """Вычисление значения поля is_in_shopping_cart."""
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
         return user.shoppingcarts.filter(recipe=obj.id).exists()
 
 
-class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
+class RecipeIngredientCreateSerializer(ProfiledSerializerMixin,
+                                       serializers.ModelSerializer):
     id = serializers.IntegerField(write_only=True)
 
     class Meta:
@@ -129,7 +145,8 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount',)
 
 
-class RecipeCreateSerializer(serializers.ModelSerializer):
+class RecipeCreateSerializer(ProfiledSerializerMixin,
+                             serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
     ingredients = RecipeIngredientCreateSerializer(many=True)
@@ -143,41 +160,46 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     @staticmethod
-    def create_ingredients(recipe, ingredients):
-        """Добавление ингредиентов в рецепт."""
-        objs = (
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=get_object_or_404(
-                    Ingredient, id=ingredient.get('id')
-                ),
-                amount=ingredient.get('amount')
-            ) for ingredient in ingredients
-        )
-        RecipeIngredient.objects.bulk_create(objs)
+    def ingredient_amounts(ingredients):
+        return {
+            ingredient['id']: int(ingredient['amount'])
+            for ingredient in ingredients
+        }
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        self.create_ingredients(recipe, ingredients)
+        RecipeIngredient.objects.set_amounts(
+            recipe, self.ingredient_amounts(ingredients)
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        Recipe.objects.lock(instance.pk)
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         super().update(instance, validated_data)
         instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(instance, ingredients)
+        amounts = self.ingredient_amounts(ingredients)
+        old_amounts = RecipeIngredient.objects.set_amounts(instance, amounts)
+        ShoppingListIngredient.objects.change_recipe(
+            instance, old_amounts, amounts
+        )
         return instance
 
     def to_representation(self, instance):
-        return RecipeSerializer(
-            instance,
-            context={'request': self.context.get('request')}
-        ).data
+        """Сохранённый рецепт перечитывается одним запросом с признаками
+        пользователя и связанными объектами, как при выводе рецептов.
+        """
+        request = self.context.get('request')
+        instance = self.context['view'].annotate_queryset(
+            Recipe.objects.filter(pk=instance.pk), request.user
+        ).get()
+        return RecipeSerializer(instance, context={'request': request}).data
 
     def validate_ingredients(self, ingredients):
         if ingredients is None:
@@ -207,6 +229,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                     'Количество ингредиентов не может быть меньше/равно нулю.'
                 )
 
+        found = Ingredient.objects.only('id').in_bulk(id_ingredients)
+        missing = [str(pk) for pk in id_ingredients if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты не найдены: {", ".join(missing)}.'
+            )
         return ingredients
 
     def validate_tags(self, tags):
@@ -221,16 +249,24 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return tags
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(ProfiledSerializerMixin,
+                            serializers.ModelSerializer):
     """Краткая форма рецепта, для использования в некоторых ViewSet."""
 
+    image_thumbnail = ImageDerivativeField('thumbnail')
+    image_card = ImageDerivativeField('card')
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = (
+            'id', 'name', 'image', 'image_thumbnail', 'image_card',
+            'cooking_time',
+        )
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class FollowUserSerializer(serializers.ModelSerializer):
+class FollowUserSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализация модели User для подписок."""
 
     recipes = RecipeShortSerializer(read_only=True, many=True)
@@ -249,9 +285,41 @@ class FollowUserSerializer(serializers.ModelSerializer):
         )
 
     def get_recipe_count(self, obj):
-        """Вычисляет количество рецептов автора."""
-        return Recipe.objects.filter(author=obj).count()
+        """Количество рецептов автора из его счётчиков."""
+        if hasattr(obj, 'recipe_count'):
+            return obj.recipe_count
+        try:
+            return obj.stats.recipes_count
+        except UserStats.DoesNotExist:
+            return Recipe.objects.filter(author=obj).count()
 
     def get_is_subscribed(self, obj):
         """Авторы в списке подписок всегда имеют признак is_subscribed=True."""
         return True
+
+
+class BatchRequestSerializer(ProfiledSerializerMixin, serializers.Serializer):
+    """Вложенный запрос пакета."""
+
+    method = serializers.ChoiceField(
+        choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE'), default='GET'
+    )
+    path = serializers.RegexField(r'^/api/', max_length=2000)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(ProfiledSerializerMixin, serializers.Serializer):
+    """Пакет запросов; с atomic=true запросы выполняются в одной
+    транзакции, которая отменяется, если хотя бы один из них неуспешен.
+    """
+
+    requests = BatchRequestSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def validate_requests(self, requests):
+        if len(requests) > settings.API_BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                'Запросов в пакете не может быть больше '
+                f'{settings.API_BATCH_MAX_REQUESTS}.'
+            )
+        return requests
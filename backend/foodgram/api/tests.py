@@ -0,0 +1,300 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from rest_framework.response import Response
+
+from api.views import TagViewSet
+from benchmarks.datasets import seed
+from foodgram.asgi import application
+from recipes.models import Recipe, ShoppingListIngredient, User
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-tests',
+    },
+    'state': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-tests-state',
+    },
+}
+SMALL_DATASET = {
+    'users': 4,
+    'recipes': 10,
+    'tags': 3,
+    'ingredients_per_recipe': 3,
+    'favorites_per_user': 2,
+    'carts_per_user': 2,
+    'follows_per_user': 1,
+}
+
+
+def send_concurrently(requests):
+    """Отправляет запросы (токен, метод, адрес, данные JSON) одновременно,
+    каждый из своего потока, и возвращает статусы ответов по порядку.
+    """
+    barrier = threading.Barrier(len(requests))
+    statuses = [None] * len(requests)
+
+    def send(number, token, method, url, data):
+        client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+        barrier.wait()
+        try:
+            statuses[number] = getattr(client, method)(
+                url, data, content_type='application/json'
+            ).status_code
+        finally:
+            connection.close()
+
+    workers = [
+        threading.Thread(target=send, args=(number, *request))
+        for number, request in enumerate(requests)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return list(statuses)
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASE_REPLICAS=[])
+class RecipeQueryCountTests(TestCase):
+    """Количество запросов к БД у списка и страницы рецепта не зависит от
+    размера страницы. Кеш очищается перед каждым тестом, поэтому ответы
+    строятся заново.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset = seed({**SMALL_DATASET, 'recipes': 60})
+        cls.recipe_id = dataset.recipe_ids[0]
+        cls.auth = {
+            'HTTP_AUTHORIZATION': f'Token {dataset.token(dataset.reader)}'
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_list_queries(self, queries, **headers):
+        for limit in (6, 50):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        f'/api/recipes/?limit={limit}', **headers
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def assert_detail_queries(self, queries, **headers):
+        with self.assertNumQueries(queries):
+            response = self.client.get(
+                f'/api/recipes/{self.recipe_id}/', **headers
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_anonymous(self):
+        self.assert_list_queries(5)
+
+    def test_list_authenticated(self):
+        self.assert_list_queries(7, **self.auth)
+
+    def test_detail_anonymous(self):
+        self.assert_detail_queries(4)
+
+    def test_detail_authenticated(self):
+        self.assert_detail_queries(6, **self.auth)
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASE_REPLICAS=[])
+class IngredientResponseCacheTests(TestCase):
+    """Ранжированный поиск ингредиентов берётся из кеша ответов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(SMALL_DATASET)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_ranked_search_cached(self):
+        path = '/api/ingredients/?name=молокл&mode=ranked'
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data)
+        with self.assertNumQueries(0):
+            cached = self.client.get(path)
+        self.assertEqual(cached.data, response.data)
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASE_REPLICAS=[])
+class ConcurrentToggleTests(TransactionTestCase):
+    """Одновременные одинаковые запросы добавления и удаления избранного,
+    списка покупок и подписки: успешен ровно один, остальные получают 400.
+    """
+
+    threads = 6
+
+    def setUp(self):
+        # Одной транзакцией: иначе каждая вставка - отдельная запись на
+        # диск.
+        with transaction.atomic():
+            dataset = seed(SMALL_DATASET)
+        self.token = dataset.token(dataset.reader)
+        reader = dataset.reader
+        author = User.objects.exclude(pk=reader.pk).exclude(
+            author__user=reader
+        ).order_by('id').first()
+        recipe_id = Recipe.objects.exclude(favorites__user=reader).exclude(
+            shoppingcarts__user=reader
+        ).order_by('id').values_list('id', flat=True).first()
+        self.urls = [
+            f'/api/recipes/{recipe_id}/favorite/',
+            f'/api/recipes/{recipe_id}/shopping_cart/',
+            f'/api/users/{author.id}/subscribe/',
+        ]
+
+    def concurrent(self, method, url):
+        return Counter(send_concurrently(
+            [(self.token, method, url, None)] * self.threads
+        ))
+
+    def test_duplicate_toggles(self):
+        for url in self.urls:
+            for method, status in (('post', 201), ('delete', 204)):
+                with self.subTest(method=method, url=url):
+                    self.assertEqual(
+                        self.concurrent(method, url),
+                        Counter({status: 1, 400: self.threads - 1}),
+                    )
+
+
+@override_settings(CACHES=TEST_CACHES, DATABASE_REPLICAS=[])
+class ConcurrentShoppingCartTests(TransactionTestCase):
+    """Изменение ингредиентов рецепта одновременно с добавлением рецепта в
+    корзины и удалением из них: списки покупок совпадают с корзинами.
+    """
+
+    rounds = 4
+
+    def setUp(self):
+        with transaction.atomic():
+            dataset = seed({**SMALL_DATASET, 'users': 8, 'carts_per_user': 0})
+        self.recipe = Recipe.objects.select_related('author').get(
+            pk=dataset.recipe_ids[0]
+        )
+        self.author_token = dataset.token(self.recipe.author)
+        self.tokens = [
+            dataset.token(user)
+            for user in User.objects.exclude(pk=self.recipe.author_id)
+        ]
+        self.tag_ids = list(self.recipe.tags.values_list('pk', flat=True))
+        self.ingredient_ids = dataset.ingredient_ids[:3]
+
+    def update_request(self, amount):
+        return (
+            self.author_token, 'patch', f'/api/recipes/{self.recipe.pk}/',
+            {
+                'tags': self.tag_ids,
+                'ingredients': [
+                    {'id': ingredient_id, 'amount': amount + number}
+                    for number, ingredient_id in enumerate(
+                        self.ingredient_ids
+                    )
+                ],
+            },
+        )
+
+    def test_update_during_cart_changes(self):
+        url = f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+        for number in range(self.rounds):
+            method, status = (
+                ('post', 201) if number % 2 == 0 else ('delete', 204)
+            )
+            statuses = send_concurrently([
+                self.update_request(10 * (number + 1)),
+                *((token, method, url, None) for token in self.tokens),
+            ])
+            self.assertEqual(
+                statuses, [200] + [status] * len(self.tokens)
+            )
+            actual = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in (
+                    ShoppingListIngredient.objects.values_list(
+                        'user_id', 'ingredient_id', 'amount'
+                    )
+                )
+            }
+            self.assertEqual(actual, ShoppingListIngredient.objects.expected())
+
+
+async def asgi_get(path):
+    """GET-запрос к ASGI-приложению; возвращает статус ответа."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application({
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'root_path': '',
+        'query_string': b'',
+        'headers': [],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 0),
+    }, receive, send)
+    return messages[0]['status']
+
+
+class AsyncRoutesConcurrencyTests(SimpleTestCase):
+    """Асинхронные маршруты под ASGI обрабатывают запросы одновременно:
+    ни один промежуточный слой не переводит цепочку в общий поток
+    синхронных представлений.
+    """
+
+    requests = 4
+    delay = 0.2
+
+    def test_requests_overlap(self):
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+
+        def slow_list(view, request, *args, **kwargs):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            time.sleep(self.delay)
+            with lock:
+                running -= 1
+            return Response([])
+
+        async def send_all():
+            return await asyncio.gather(*(
+                asgi_get('/api/tags/') for _ in range(self.requests)
+            ))
+
+        with mock.patch.object(TagViewSet, 'list', slow_list):
+            start = time.monotonic()
+            statuses = asyncio.run(send_all())
+            elapsed = time.monotonic() - start
+        self.assertEqual(statuses, [200] * self.requests)
+        self.assertEqual(max_running, self.requests)
+        self.assertLess(elapsed, self.delay * self.requests / 2)
@@ -0,0 +1,22 @@
+from django.urls import re_path
+
+from . import async_views
+from .urls import urlpatterns as wsgi_urlpatterns
+
+app_name = 'api'
+
+# Маршруты с теми же адресами и именами, что у роутера в api/urls.py,
+# стоят первыми и перекрывают синхронные. id рецепта - только цифры,
+# чтобы не перехватывать действия вроде recipes/download_shopping_cart/.
+urlpatterns = [
+    re_path(r'^tags/$', async_views.tag_list, name='tags-list'),
+    re_path(
+        r'^ingredients/$', async_views.ingredient_list,
+        name='ingredients-list',
+    ),
+    re_path(
+        r'^recipes/(?P<pk>\d+)/$', async_views.recipe_detail,
+        name='recipes-detail',
+    ),
+    *wsgi_urlpatterns,
+]
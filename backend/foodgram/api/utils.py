@@ -1,23 +1,57 @@
+import csv
+
+from django.db import transaction
 from rest_framework import status
 from rest_framework.response import Response
 
-from recipes.models import Follow, Favorite, ShoppingCart
+from recipes.models import (Follow, Favorite, Recipe, ShoppingCart,
+                            ShoppingListIngredient, UserStats)
+from recipes.versions import bump_version
+
+SHOPPING_LIST_CHUNK_SIZE = 100
+
+
+def change_counter(model, attrs, delta):
+    """Меняет счётчик, связанный с записью Favorite, Follow, ShoppingCart."""
+    if model is Follow:
+        UserStats.objects.change(
+            attrs.get('author').pk, 'followers_count', delta
+        )
+        return
+    field = {
+        Favorite: 'favorites_count',
+        ShoppingCart: 'shoppingcarts_count',
+    }[model]
+    Recipe.objects.change(attrs.get('recipe').pk, field, delta)
 
 
 def create_obj(attrs, model, serializer):
-    """Создание записей в таблицах Favorite, Follow, ShoppingCart."""
+    """Создание записей в таблицах Favorite, Follow, ShoppingCart.
+    Запись добавляется одним запросом; из одновременных одинаковых
+    запросов успешен один, остальные получают ответ 400.
+    """
     model_attr = {
         Follow: 'author',
         Favorite: 'recipe',
         ShoppingCart: 'recipe'
     }
 
-    if model.objects.filter(**attrs).exists():
+    with transaction.atomic():
+        if model is ShoppingCart:
+            Recipe.objects.lock(attrs.get('recipe').pk)
+        created = model.objects.add(**attrs)
+        if created:
+            change_counter(model, attrs, 1)
+            bump_version(model)
+            if model is ShoppingCart:
+                ShoppingListIngredient.objects.add_recipe(
+                    attrs.get('user'), attrs.get('recipe')
+                )
+    if not created:
         return Response(
             {'errors': 'Запись уже существует.'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    model.objects.create(**attrs)
     return Response(
         serializer(attrs.get(model_attr[model])).data,
         status=status.HTTP_201_CREATED
@@ -25,11 +59,68 @@ def create_obj(attrs, model, serializer):
 
 
 def delete_obj(attrs, model):
-    """Удаление записей из таблиц Favorite, Follow, ShoppingCart."""
-    if not model.objects.filter(**attrs):
+    """Удаление записей из таблиц Favorite, Follow, ShoppingCart одним
+    запросом DELETE; наличие записи определяется по числу удалённых строк.
+    """
+    with transaction.atomic():
+        if model is ShoppingCart:
+            Recipe.objects.lock(attrs.get('recipe').pk)
+        deleted = model.objects.remove(**attrs)
+        if deleted:
+            change_counter(model, attrs, -1)
+            bump_version(model)
+            if model is ShoppingCart:
+                ShoppingListIngredient.objects.remove_recipe(
+                    attrs.get('user'), attrs.get('recipe')
+                )
+    if not deleted:
         return Response(
             {'errors': 'Запись отсутствует.'},
             status=status.HTTP_400_BAD_REQUEST
         )
-    model.objects.get(**attrs).delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class Echo:
+    """Объект с интерфейсом файла, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def chunked(lines, size=SHOPPING_LIST_CHUNK_SIZE):
+    """Объединяет строки в блоки, чтобы не отдавать ответ по одной строке."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def shopping_list_txt(user, ingredients):
+    """Строки списка покупок в текстовом формате."""
+    yield f'Список покупок пользователя {user.username}:\n'
+    for name, measurement_unit, amount in ingredients:
+        yield f'{name}: {amount} {measurement_unit}\n'
+
+
+def shopping_list_csv(user, ingredients):
+    """Строки списка покупок в формате CSV.
+
+    Файл начинается с BOM, чтобы табличные редакторы распознали UTF-8.
+    """
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(
+        ('Ингредиент', 'Количество', 'Единица измерения')
+    )
+    for name, measurement_unit, amount in ingredients:
+        yield writer.writerow((name, amount, measurement_unit))
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (shopping_list_txt, 'text/plain; charset=utf-8'),
+    'csv': (shopping_list_csv, 'text/csv; charset=utf-8'),
+}
@@ -0,0 +1,58 @@
+"""Отношения текущего пользователя к другим объектам в рамках запроса.
+
+Сериализаторы пользователей вызываются для каждого автора в списке и
+для вложенного автора каждого рецепта. Чтобы признак is_subscribed не
+стоил запроса на каждый объект, идентификаторы авторов, на которых
+подписан текущий пользователь, загружаются одним запросом при первом
+обращении и хранятся до конца запроса.
+"""
+from django.utils.functional import cached_property
+
+from recipes.models import Follow
+
+CONTEXT_KEY = 'viewer'
+
+
+class Viewer:
+
+    def __init__(self, user):
+        self.user = user
+
+    @cached_property
+    def followed_ids(self):
+        if self.user is None or self.user.is_anonymous:
+            return frozenset()
+        return frozenset(
+            Follow.objects.filter(user=self.user).values_list(
+                'author_id', flat=True
+            )
+        )
+
+    def is_subscribed(self, author):
+        return author.pk in self.followed_ids
+
+
+def get_viewer(context):
+    """Viewer из контекста сериализатора; без него - из запроса, где он
+    создаётся один раз и сохраняется.
+    """
+    viewer = context.get(CONTEXT_KEY)
+    if viewer is not None:
+        return viewer
+    request = context.get('request')
+    if request is None:
+        return Viewer(None)
+    viewer = getattr(request, '_viewer', None)
+    if viewer is None or viewer.user != request.user:
+        viewer = Viewer(request.user)
+        request._viewer = viewer
+    return viewer
+
+
+class ViewerContextMixin:
+    """Передаёт сериализаторам представления общий Viewer запроса."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[CONTEXT_KEY] = get_viewer(context)
+        return context
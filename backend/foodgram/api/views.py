@@ -1,8 +1,9 @@
-import os.path
-
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import (Count, Exists, Max, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -10,23 +11,35 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-
-from .filters import IngredientSearchFilter, RecipeFilter
-from .paginations import PageNumberPaginationLimit
+from rest_framework.views import APIView
+
+from .batch import dispatch
+from .conditional import ConditionalGetMixin
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
+from .ingredient_search import ranked_search
+from .paginations import (PageNumberOrCursorPagination,
+                          PageNumberPaginationLimit)
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnlyPermission
-from .serializers import (CustomUserSerializer, FollowUserSerializer,
-                          IngredientSerializer, RecipeCreateSerializer,
-                          RecipeSerializer, RecipeShortSerializer,
-                          TagSerializer)
-from .utils import create_obj, delete_obj
-from foodgram.settings import MEDIA_ROOT
-from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCart,
-                            Tag)
+from .response_cache import ResponseCacheMixin
+from .serializers import (BatchSerializer, CustomUserSerializer,
+                          FollowUserSerializer, IngredientSerializer,
+                          RecipeCreateSerializer, RecipeSerializer,
+                          RecipeShortSerializer, TagSerializer)
+from .utils import (SHOPPING_LIST_FORMATS, chunked, create_obj,
+                    delete_obj)
+from .viewer import ViewerContextMixin
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, RecipeTag, ShoppingCart,
+                            ShoppingListIngredient, Tag, UserStats,
+                            count_subquery)
+from recipes.tasks import delete_image
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ConditionalGetMixin, ViewerContextMixin,
+                        UserViewSet):
     """Получение списка пользователей, профиль пользователя,
     текущего пользователя.
     Подписки пользователя, подписаться на пользователя, удалить подписку
@@ -36,25 +49,51 @@ class CustomUserViewSet(UserViewSet):
     serializer_class = CustomUserSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = PageNumberPaginationLimit
+    count_versioned_models = (User, Follow)
+    count_estimate = True
+    conditional_versioned_models = (User, Follow)
+
+    def list_validators(self, request):
+        return request.get_full_path(), None
+
+    def retrieve_validators(self, request):
+        return request.get_full_path(), None
 
     @action(
         url_path='subscriptions',
         methods=['get'],
         detail=False,
         permission_classes=(IsAuthenticated,),
+        pagination_class=PageNumberOrCursorPagination,
     )
     def get_subscriptions(self, response):
-        """Подписки пользователя."""
-        limit = self.request.query_params.get('recipes_limit')
+        """Подписки пользователя.
+        Не более recipes_limit последних рецептов каждого автора отбираются
+        в БД коррелированным подзапросом, количество рецептов берётся из
+        счётчиков автора, поэтому число запросов и объём данных не зависят
+        от количества рецептов у авторов.
+        """
+        limit = self.request.query_params.get('recipes_limit', '')
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'has_image_derivatives', 'cooking_time',
+            'author_id',
+        )
+        if limit.isdigit():
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:int(limit)]
+            ))
         pages = self.paginate_queryset(
-            User.objects.filter(author__user=self.request.user)
+            User.objects.filter(
+                author__user=self.request.user
+            ).annotate(
+                recipe_count=Coalesce(
+                    'stats__recipes_count', count_subquery(Recipe, 'author')
+                )
+            ).prefetch_related(Prefetch('recipes', queryset=recipes))
         )
         serializer = FollowUserSerializer(pages, many=True)
-        if limit:
-            for user in serializer.data:
-                if user.get('recipes'):
-                    user['recipes'] = user.get('recipes')[:int(limit)]
-
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -83,34 +122,96 @@ class CustomUserViewSet(UserViewSet):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ResponseCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Список тегов, получение тега по id."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
+    response_cache_versioned_models = (Tag,)
+    response_cache_actions = ('list', 'retrieve')
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, ResponseCacheMixin,
+                    ViewerContextMixin, viewsets.ModelViewSet):
     """Получение списка рецептов, одного рецепта.
     Создание рецепта, обновление и удаление.
+    Список рецептов для анонимных пользователей кешируется.
     """
 
     permission_classes = (IsAuthorOrReadOnlyPermission,)
-    pagination_class = PageNumberPaginationLimit
+    pagination_class = PageNumberOrCursorPagination
+    count_versioned_models = (Recipe, RecipeTag, Favorite, ShoppingCart)
+    count_estimate = True
+    conditional_versioned_models = (
+        Tag, Ingredient, User, Favorite, ShoppingCart, Follow,
+    )
+    response_cache_versioned_models = (
+        Recipe, RecipeTag, RecipeIngredient, Tag, Ingredient, User,
+    )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def response_cache_allowed(self, request):
+        return request.user.is_anonymous
+
     def get_queryset(self):
-        user = self.request.user
-        if self.request.query_params.get('is_favorited'):
-            return Recipe.objects.filter(favorites__user=user)
-        if self.request.query_params.get('is_in_shopping_cart'):
-            return Recipe.objects.filter(shoppingcarts__user=user)
+        """Признаки пользователя и связанные объекты нужны только для
+        вывода рецептов; изменению и удалению достаточно самой записи.
+        """
+        if self.action in ('list', 'retrieve'):
+            return self.annotate_queryset(
+                Recipe.objects.all(), self.request.user
+            )
         return Recipe.objects.all()
 
+    def list_validators(self, request):
+        """Время последнего изменения и количество отобранных рецептов."""
+        stats = self.filter_queryset(Recipe.objects.all()).aggregate(
+            last_updated=Max('updated'), total=Count('pk')
+        )
+        return (
+            (request.get_full_path(), stats['total'], stats['last_updated']),
+            stats['last_updated'],
+        )
+
+    def retrieve_validators(self, request):
+        updated = Recipe.objects.filter(
+            pk=self.kwargs[self.lookup_field]
+        ).values_list('updated', flat=True).first()
+        return (request.get_full_path(), updated), updated
+
+    @staticmethod
+    def annotate_queryset(queryset, user):
+        """Добавляет к рецептам признаки избранного и списка покупок
+        текущего пользователя и подгружает связанные объекты, чтобы
+        количество запросов не зависело от размера страницы. Признак
+        подписки на автора берётся из api.viewer.Viewer.
+        """
+        if user.is_anonymous:
+            is_favorited = is_in_shopping_cart = Value(False)
+        else:
+            is_favorited = Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+            is_in_shopping_cart = Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            )
+        return queryset.annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+        ).select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        UserStats.objects.change(self.request.user.pk, 'recipes_count', 1)
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -126,30 +227,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_download_shopping_cart(self, request):
         """Формирует и возвращает список ингредиентов, на основе рецептов,
         добавленных в список покупок.
+        Формат файла задаётся параметром file_format: txt (по умолчанию)
+        или csv. Файл отдаётся потоком по мере чтения строк из БД.
         """
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in SHOPPING_LIST_FORMATS:
+            return Response(
+                {'errors': 'Неизвестный формат файла.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         user = self.request.user
-        queryset_shopping_cart = ShoppingCart.objects.filter(
+        ingredients = ShoppingListIngredient.objects.filter(
             user=user
-        ).select_related(
-            'recipe'
         ).values_list(
-            'recipe__recipeingredients__ingredient__name',
-            'recipe__recipeingredients__ingredient__measurement_unit'
-        ).annotate(
-            amount=Sum('recipe__recipeingredients__amount')
-        )
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).order_by('ingredient__name').iterator()
 
-        shopping_cart_list = f'Список покупок пользователя {user.username}:\n'
-        for ingredient in queryset_shopping_cart:
-            shopping_cart_list += (
-                f'{ingredient[0]}: {ingredient[2]} {ingredient[1]}\n'
-            )
-
-        response = HttpResponse(
-            shopping_cart_list, content_type='text.txt; charset=utf-8'
+        lines, content_type = SHOPPING_LIST_FORMATS[file_format]
+        response = StreamingHttpResponse(
+            chunked(lines(user, ingredients)), content_type=content_type
         )
         response['Content-Disposition'] = (
-            'attachment; filename=shopping_cart_list.txt'
+            f'attachment; filename=shopping_cart_list.{file_format}'
         )
         return response
 
@@ -193,17 +292,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    @transaction.atomic
     def perform_destroy(self, instance):
-        image_path = os.path.join(MEDIA_ROOT, str(instance.image))
-        os.remove(image_path)
+        if instance.image:
+            delete_image.delay(instance.image.name)
+        UserStats.objects.change(instance.author_id, 'recipes_count', -1)
         instance.delete()
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    """Получение ингредиентов."""
+class IngredientViewSet(ResponseCacheMixin, viewsets.ReadOnlyModelViewSet):
+    """Получение ингредиентов.
+    Список и поиск по началу названия (параметр name) отдаются из индекса
+    в памяти процесса без обращения к БД и кеша ответов: индекс быстрее
+    чтения из кеша. С параметром mode=ranked возвращаются не более limit
+    лучших совпадений с учётом опечаток; похожие по триграммам ищутся в БД,
+    поэтому такие ответы кешируются.
+    """
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+    response_cache_versioned_models = (Ingredient,)
+    response_cache_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('mode') == 'ranked':
+            return self.dispatch_cached(
+                self.ranked_list, request, *args, **kwargs
+            )
+        return Response(
+            ingredient_index.search(request.query_params.get('name', ''))
+        )
+
+    def ranked_list(self, request, *args, **kwargs):
+        limit = request.query_params.get('limit', '')
+        return Response(ranked_search(
+            request.query_params.get('name', ''),
+            int(limit) if limit.isdigit() else None,
+        ))
+
+
+class BatchView(APIView):
+    """Выполнение нескольких запросов к API за один HTTP-запрос.
+    Права проверяются для каждого вложенного запроса отдельно.
+    """
+
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        subrequests = serializer.validated_data['requests']
+        if not serializer.validated_data['atomic']:
+            return Response({'responses': [
+                dispatch(request, **subrequest) for subrequest in subrequests
+            ]})
+
+        responses = []
+        with transaction.atomic():
+            for subrequest in subrequests:
+                responses.append(dispatch(request, **subrequest))
+                if responses[-1]['status'] >= 400:
+                    transaction.set_rollback(True)
+                    break
+        committed = responses[-1]['status'] < 400
+        return Response(
+            {'committed': committed, 'responses': responses},
+            status=status.HTTP_200_OK if committed
+            else status.HTTP_400_BAD_REQUEST,
+        )
@@ -0,0 +1,198 @@
+import csv
+import os
+import random
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, RecipeTag, ShoppingCart,
+                            ShoppingListIngredient, Tag, UserStats)
+from recipes.trigrams import rebuild_trigrams
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+PASSWORD = 'benchmark-password'
+IMAGE = 'recipes/benchmark.png'
+
+DATASETS = {
+    'small': {
+        'users': 50,
+        'recipes': 500,
+        'tags': 3,
+        'ingredients_per_recipe': 6,
+        'favorites_per_user': 20,
+        'carts_per_user': 10,
+        'follows_per_user': 5,
+    },
+    'medium': {
+        'users': 300,
+        'recipes': 3000,
+        'tags': 5,
+        'ingredients_per_recipe': 8,
+        'favorites_per_user': 50,
+        'carts_per_user': 20,
+        'follows_per_user': 10,
+    },
+    'large': {
+        'users': 1000,
+        'recipes': 10000,
+        'tags': 8,
+        'ingredients_per_recipe': 8,
+        'favorites_per_user': 200,
+        'carts_per_user': 50,
+        'follows_per_user': 30,
+    },
+}
+
+
+class Dataset:
+    """Сведения о заполненной базе, нужные сценариям замеров."""
+
+    def __init__(self, config, reader, tokens, authors, recipe_ids, tags,
+                 ingredient_ids):
+        self.config = config
+        self.reader = reader
+        self.tokens = tokens
+        self.authors = authors
+        self.recipe_ids = recipe_ids
+        self.tags = tags
+        self.ingredient_ids = ingredient_ids
+
+    def token(self, user):
+        return self.tokens[user.id]
+
+
+def load_ingredients():
+    """Создаёт каталог ингредиентов из ingredients.csv проекта."""
+    path = os.path.join(settings.BASE_DIR, 'ingredients.csv')
+    with open(path, encoding='utf-8') as fdata:
+        rows = {
+            (name, measurement_unit)
+            for name, measurement_unit in csv.reader(fdata)
+        }
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in sorted(rows)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    rebuild_trigrams()
+    return list(Ingredient.objects.values_list('id', flat=True))
+
+
+def seed(config, seed_value=0):
+    """Заполняет пустую базу данными заданного размера.
+
+    Все связи выбираются псевдослучайно с фиксированным зерном, поэтому
+    повторные прогоны на одном наборе дают одинаковые ответы.
+    """
+    rnd = random.Random(seed_value)
+    password = make_password(PASSWORD)
+
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            ) for number in range(config['users'])
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    users = list(User.objects.order_by('id'))
+    Token.objects.bulk_create(
+        (Token(key=Token.generate_key(), user=user) for user in users),
+        batch_size=BATCH_SIZE,
+    )
+    tokens = dict(Token.objects.values_list('user_id', 'key'))
+
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#{number:06X}', slug=f'tag{number}')
+        for number in range(config['tags'])
+    )
+    tags = list(Tag.objects.order_by('id'))
+    ingredient_ids = load_ingredients()
+
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                name=f'Рецепт {number}',
+                text='Описание рецепта. ' * 10,
+                image=IMAGE,
+                cooking_time=rnd.randint(1, 120),
+                author=rnd.choice(users),
+            ) for number in range(config['recipes'])
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = list(Recipe.objects.order_by('id').values_list(
+        'id', flat=True
+    ))
+
+    RecipeTag.objects.bulk_create(
+        (
+            RecipeTag(recipe_id=recipe_id, tag=tag)
+            for recipe_id in recipe_ids
+            for tag in rnd.sample(tags, rnd.randint(1, min(3, len(tags))))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rnd.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rnd.sample(
+                ingredient_ids, config['ingredients_per_recipe']
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    for model, per_user in (
+        (Favorite, config['favorites_per_user']),
+        (ShoppingCart, config['carts_per_user']),
+    ):
+        model.objects.bulk_create(
+            (
+                model(user=user, recipe_id=recipe_id)
+                for user in users
+                for recipe_id in rnd.sample(
+                    recipe_ids, min(per_user, len(recipe_ids))
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    ShoppingListIngredient.objects.rebuild()
+    Follow.objects.bulk_create(
+        (
+            Follow(user=user, author=author)
+            for user in users
+            for author in rnd.sample(
+                users, min(config['follows_per_user'] + 1, len(users))
+            )
+            if author != user
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Recipe.objects.recount()
+    UserStats.objects.recount()
+
+    # От имени первого пользователя выполняются запросы сценариев.
+    reader = users[0]
+    authors = list(
+        User.objects.filter(author__user=reader).order_by('id')[:2]
+    )
+    return Dataset(
+        config, reader, tokens, authors, recipe_ids, tags, ingredient_ids
+    )
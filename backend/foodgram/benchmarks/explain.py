@@ -0,0 +1,68 @@
+"""Проверка планов запросов API.
+
+Запросы SELECT, выполненные маршрутами API, повторяются с EXPLAIN, и в
+планах ищется последовательное чтение больших таблиц: Seq Scan в
+PostgreSQL и SCAN без индекса в SQLite.
+"""
+import re
+
+from django.db import connection
+
+SELECT_RE = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+ALIAS_RE = re.compile(r'"(\w+)" (U\d+)\b')
+# SQLite не отличает в плане чтение таблицы целиком от обхода первичного
+# ключа по порядку с остановкой на LIMIT (ORDER BY id DESC LIMIT 6).
+PK_ORDER_RE = re.compile(
+    r'ORDER BY "(\w+)"\."id" (?:ASC|DESC)\s+LIMIT\b', re.IGNORECASE
+)
+SCAN_RE = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'^SCAN (?:TABLE )?(\w+)(?!.*\bUSING\b)'),
+}
+
+
+def table_sizes(tables=None):
+    """Количество строк в таблицах проекта."""
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in tables or connection.introspection.table_names(cursor):
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+            )
+            sizes[table] = cursor.fetchone()[0]
+    return sizes
+
+
+def analyze():
+    """Обновляет статистику планировщика после заполнения базы."""
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def explain(sql):
+    """Текст плана запроса, по строке на узел."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def sequential_scans(sql, plan):
+    """Таблицы, которые план читает последовательно. Псевдонимы
+    подзапросов (U0, U1) заменяются именами таблиц.
+    """
+    aliases = {alias: table for table, alias in ALIAS_RE.findall(sql)}
+    pattern = SCAN_RE.get(connection.vendor)
+    if pattern is None:
+        return set()
+    scans = {
+        aliases.get(match.group(1), match.group(1)).lower()
+        for line in plan
+        for match in [pattern.search(line.strip())] if match
+    }
+    if connection.vendor == 'sqlite':
+        scans -= {table.lower() for table in PK_ORDER_RE.findall(sql)}
+    return scans
+
+
+def selects(statements):
+    return [sql for sql in statements if SELECT_RE.match(sql)]
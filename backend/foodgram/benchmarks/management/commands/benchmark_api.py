@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from benchmarks.datasets import DATASETS, seed
+from benchmarks.routes import SCENARIOS, SKIPPED_ROUTES
+from benchmarks.runner import compare, run, uncovered_routes
+
+# Замеры не должны видеть и портить кеш работающего сервера.
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmarks',
+    },
+    'state': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmarks-state',
+    },
+}
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'baseline.json',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеры числа запросов к БД, времени и размера ответа для маршрутов '
+        'API на заполненной тестовой базе со сравнением с эталоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset', choices=sorted(DATASETS), default='small',
+            help='Размер набора данных',
+        )
+        for option in DATASETS['small']:
+            parser.add_argument(
+                f'--{option.replace("_", "-")}', type=int, dest=option,
+                help='Переопределить параметр набора данных',
+            )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Количество повторов каждого сценария',
+        )
+        parser.add_argument(
+            '--only', nargs='*', default=(),
+            help='Запустить только перечисленные сценарии',
+        )
+        parser.add_argument(
+            '--baseline', default=BASELINE_PATH, help='Файл с эталоном',
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты в эталон вместо сравнения',
+        )
+        parser.add_argument(
+            '--output', help='Сохранить результаты в JSON-файл',
+        )
+        parser.add_argument(
+            '--time-tolerance', type=float, default=1.0,
+            help='Допустимый относительный рост времени ответа',
+        )
+        parser.add_argument(
+            '--time-floor', type=float, default=5.0,
+            help='Допустимый абсолютный рост времени ответа, мс',
+        )
+        parser.add_argument(
+            '--size-tolerance', type=float, default=0.1,
+            help='Допустимый относительный рост размера ответа',
+        )
+
+    def handle(self, *args, **options):
+        missing = uncovered_routes(SCENARIOS, SKIPPED_ROUTES)
+        if missing:
+            raise CommandError(
+                'Нет сценариев для маршрутов: ' + ', '.join(missing)
+            )
+
+        config = dict(DATASETS[options['dataset']])
+        overridden = False
+        for option in config:
+            if options.get(option) is not None:
+                config[option] = options[option]
+                overridden = True
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['only'] or scenario.name in options['only']
+        ]
+
+        results = self.run_scenarios(config, scenarios, options['repeat'])
+        self.report(results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fdata:
+                json.dump(results, fdata, ensure_ascii=False, indent=2)
+
+        errors = [
+            f'{scenario.name}: статус {results[scenario.name]["status"]}, '
+            f'ожидался {scenario.status}'
+            for scenario in scenarios
+            if results[scenario.name]['status'] != scenario.status
+        ]
+        if errors:
+            raise CommandError('\n'.join(errors))
+
+        baseline = self.load_baseline(options['baseline'])
+        key = options['dataset'] + ('-custom' if overridden else '')
+        if options['update_baseline']:
+            baseline.setdefault(key, {}).update(results)
+            with open(options['baseline'], 'w', encoding='utf-8') as fdata:
+                json.dump(
+                    baseline, fdata, ensure_ascii=False, indent=2,
+                    sort_keys=True,
+                )
+                fdata.write('\n')
+            self.stdout.write(f'Эталон «{key}» обновлён.')
+            return
+
+        if key not in baseline:
+            self.stdout.write(f'В эталоне нет набора «{key}», сравнение '
+                              'пропущено.')
+            return
+        failures = compare(
+            results, baseline[key], options['time_tolerance'],
+            options['size_tolerance'], options['time_floor'],
+        )
+        if failures:
+            raise CommandError(
+                'Превышены пороги эталона:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
+
+    def run_scenarios(self, config, scenarios, repeat):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root, CACHES=BENCHMARK_CACHES,
+                    DATABASE_REPLICAS=[],
+                ):
+                    dataset = seed(config)
+                    return {
+                        scenario.name: run(scenario, dataset, repeat)
+                        for scenario in scenarios
+                    }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"сценарий":<34}{"статус":>7}{"запросы":>9}'
+            f'{"время, мс":>11}{"размер":>10}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<34}{result["status"]:>7}{result["queries"]:>9}'
+                f'{result["time_ms"]:>11.1f}{result["size"]:>10}'
+            )
+
+    @staticmethod
+    def load_baseline(path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as fdata:
+            return json.load(fdata)
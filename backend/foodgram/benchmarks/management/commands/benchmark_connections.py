@@ -0,0 +1,177 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from benchmarks.datasets import DATASETS, seed
+
+# Каждый запрос выполняет запросы к БД, а не берёт ответ из кеша.
+DUMMY_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+    'state': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-connections-state',
+    },
+}
+# Режимы соединений: новое на каждый запрос (CONN_MAX_AGE=0), постоянное
+# без проверки и с проверкой перед повторным использованием, пул.
+MODES = {
+    'close': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False},
+    'checked': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+    'pool': {
+        'ENGINE': 'foodgram.postgresql_pool',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Время запросов к API через WSGI-обработчик с новым соединением с '
+        'БД на каждый запрос, с постоянными соединениями и с пулом '
+        'соединений (только PostgreSQL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=300,
+            help='Количество запросов в каждом режиме',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Количество потоков, как у gunicorn --threads',
+        )
+        parser.add_argument(
+            '--pool-size', type=int,
+            help='Размер пула, по умолчанию половина числа потоков',
+        )
+        parser.add_argument(
+            '--path', default='/api/tags/', help='Адрес запроса',
+        )
+
+    def handle(self, *args, **options):
+        modes = dict(MODES)
+        if connection.vendor != 'postgresql':
+            modes.pop('pool')
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # База в памяти не закрывается вместе с соединением.
+                test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                with override_settings(
+                    MEDIA_ROOT=directory, CACHES=DUMMY_CACHES,
+                    DATABASE_REPLICAS=[],
+                ):
+                    seed(DATASETS['small'])
+                    results = {
+                        name: self.measure(
+                            {
+                                **connection.settings_dict, **overrides,
+                                'POOL_SIZE': options['pool_size'] or max(
+                                    options['threads'] // 2, 1
+                                ),
+                                'POOL_TIMEOUT': 30,
+                            },
+                            options['path'], options['requests'],
+                            options['threads'],
+                        )
+                        for name, overrides in modes.items()
+                    }
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.report(results)
+
+    @staticmethod
+    def measure(settings_dict, path, requests, threads):
+        """Выполняет запросы в threads потоках, у каждого из которых своё
+        соединение с настройками settings_dict. Возвращает медиану и 95-й
+        процентиль времени запроса, запросы в секунду и число открытых
+        соединений с БД.
+        """
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        backend = load_backend(settings_dict['ENGINE'])
+        times = []
+        statuses = set()
+        # Ссылки на соединения драйвера: соединение, повторно выданное
+        # пулом, считается один раз.
+        opened = set()
+
+        def start_response(status, headers):
+            statuses.add(status)
+
+        def connected(sender, connection, **kwargs):
+            opened.add(connection.connection)
+
+        def send(count):
+            wrapper = backend.DatabaseWrapper(
+                dict(settings_dict), DEFAULT_DB_ALIAS
+            )
+            connections[DEFAULT_DB_ALIAS] = wrapper
+            try:
+                for _ in range(count):
+                    environ = factory.get(path).environ
+                    start = time.perf_counter()
+                    response = handler(environ, start_response)
+                    b''.join(response)
+                    response.close()
+                    times.append((time.perf_counter() - start) * 1000)
+            finally:
+                wrapper.close()
+
+        counts = [requests // threads] * threads
+        counts[0] += requests % threads
+        workers = [
+            threading.Thread(target=send, args=(count,)) for count in counts
+        ]
+        connection_created.connect(connected)
+        start = time.perf_counter()
+        try:
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            connection_created.disconnect(connected)
+        elapsed = time.perf_counter() - start
+        if statuses != {'200 OK'}:
+            raise CommandError(f'{path}: ответы {", ".join(statuses)}')
+        return {
+            'median_ms': statistics.median(times),
+            'p95_ms': statistics.quantiles(times, n=20)[-1],
+            'rps': len(times) / elapsed,
+            'connections': len(opened),
+        }
+
+    def report(self, results):
+        # Выигрыш относительно нового соединения на каждый запрос.
+        baseline = results['close']['median_ms']
+        self.stdout.write(
+            f'{"режим":<12}{"медиана, мс":>13}{"p95, мс":>10}'
+            f'{"выигрыш, мс":>13}{"запросов/с":>12}{"соединений":>12}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<12}{result["median_ms"]:>13.2f}'
+                f'{result["p95_ms"]:>10.2f}'
+                f'{baseline - result["median_ms"]:>13.2f}'
+                f'{result["rps"]:>12.0f}{result["connections"]:>12}'
+            )
@@ -0,0 +1,96 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from benchmarks.datasets import DATASETS, seed
+from benchmarks.explain import (analyze, explain, selects, sequential_scans,
+                                table_sizes)
+from benchmarks.management.commands.benchmark_api import BENCHMARK_CACHES
+from benchmarks.routes import SCENARIOS
+from benchmarks.runner import measure
+
+
+class Command(BaseCommand):
+    help = (
+        'Планы запросов к БД для GET-маршрутов API на заполненной тестовой '
+        'базе; ошибка, если большая таблица читается последовательно'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset', choices=sorted(DATASETS), default='medium',
+            help='Размер набора данных',
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=5000,
+            help='С какого количества строк таблица считается большой',
+        )
+        parser.add_argument(
+            '--only', nargs='*', default=(),
+            help='Проверить только перечисленные сценарии',
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Вывести планы всех запросов',
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if scenario.method == 'get' and scenario.status == 200
+            and (not options['only'] or scenario.name in options['only'])
+        ]
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root, CACHES=BENCHMARK_CACHES,
+                    DATABASE_REPLICAS=[],
+                ):
+                    failures = self.inspect_plans(
+                        DATASETS[options['dataset']], scenarios,
+                        options['min_rows'], options['verbose_plans'],
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if failures:
+            raise CommandError(
+                'Последовательное чтение больших таблиц:\n'
+                + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Большие таблицы читаются по индексам.'
+        ))
+
+    def inspect_plans(self, config, scenarios, min_rows, verbose):
+        dataset = seed(config)
+        analyze()
+        large = {
+            table for table, rows in table_sizes().items()
+            if rows >= min_rows
+        }
+        self.stdout.write('Большие таблицы: ' + ', '.join(sorted(large)))
+        failures = []
+        for scenario in scenarios:
+            statements = selects(measure(scenario, dataset)['sql'])
+            for sql in statements:
+                plan = explain(sql)
+                if verbose:
+                    self.stdout.write(
+                        f'{scenario.name}: {sql}\n  ' + '\n  '.join(plan)
+                    )
+                scans = sequential_scans(sql, plan) & large
+                if scans:
+                    failures.append(
+                        f'{scenario.name}: {", ".join(sorted(scans))}\n'
+                        f'  {sql}\n  ' + '\n  '.join(plan)
+                    )
+            self.stdout.write(f'{scenario.name}: запросов {len(statements)}')
+        return failures
@@ -0,0 +1,144 @@
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from benchmarks.datasets import DATASETS, seed
+from benchmarks.management.commands.benchmark_api import BENCHMARK_CACHES
+from recipes.models import (Recipe, ShoppingListIngredient, User,
+                            UserStats)
+
+# Ответы, которые должны получить одновременные одинаковые запросы:
+# ровно один успешный, остальные - 400.
+EXPECTED = {'post': 201, 'delete': 204}
+
+
+class Command(BaseCommand):
+    help = (
+        'Одновременные одинаковые запросы добавления и удаления избранного, '
+        'списка покупок и подписки из нескольких потоков с проверкой '
+        'ответов и согласованности счётчиков и списков покупок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Количество одновременных запросов',
+        )
+        parser.add_argument(
+            '--rounds', type=int, default=10,
+            help='Количество циклов добавления и удаления',
+        )
+
+    def handle(self, *args, **options):
+        # Ожидаемые ответы 400 не выводятся в журнал.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        setup_test_environment()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # База в памяти недоступна для параллельной записи из
+                # разных соединений.
+                test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                with override_settings(
+                    MEDIA_ROOT=directory, CACHES=BENCHMARK_CACHES,
+                    DATABASE_REPLICAS=[],
+                ):
+                    errors = self.hammer(options['threads'], options['rounds'])
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+        if errors:
+            raise CommandError('\n'.join(errors))
+        self.stdout.write(self.style.SUCCESS('Ответы и счётчики корректны.'))
+
+    def hammer(self, threads, rounds):
+        dataset = seed(DATASETS['small'])
+        token = dataset.token(dataset.reader)
+        reader = dataset.reader
+        author = User.objects.exclude(pk=reader.pk).exclude(
+            author__user=reader
+        ).order_by('id').first()
+        recipe_id = Recipe.objects.exclude(favorites__user=reader).exclude(
+            shoppingcarts__user=reader
+        ).order_by('id').values_list('id', flat=True).first()
+        urls = [
+            f'/api/recipes/{recipe_id}/favorite/',
+            f'/api/recipes/{recipe_id}/shopping_cart/',
+            f'/api/users/{author.id}/subscribe/',
+        ]
+        errors = []
+        for url in urls:
+            for _ in range(rounds):
+                for method in ('post', 'delete'):
+                    statuses = self.concurrent(url, method, token, threads)
+                    expected = Counter({
+                        EXPECTED[method]: 1, 400: threads - 1
+                    })
+                    if statuses != expected:
+                        errors.append(
+                            f'{method.upper()} {url}: {dict(statuses)}, '
+                            f'ожидалось {dict(expected)}'
+                        )
+            self.stdout.write(f'{url}: {rounds} циклов по {threads} запроса')
+        return errors + self.check_consistency()
+
+    @staticmethod
+    def concurrent(url, method, token, threads):
+        """Отправляет threads одинаковых запросов одновременно и
+        возвращает количество ответов с каждым статусом.
+        """
+        barrier = threading.Barrier(threads)
+        statuses = []
+
+        def send():
+            client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+            barrier.wait()
+            try:
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=send) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return Counter(statuses)
+
+    @staticmethod
+    def check_consistency():
+        errors = []
+        with transaction.atomic():
+            recipes = Recipe.objects.recount()
+            users = UserStats.objects.recount()
+            transaction.set_rollback(True)
+        if recipes or users:
+            errors.append(
+                f'Разошлись счётчики рецептов: {recipes}, '
+                f'пользователей: {users}'
+            )
+        expected = ShoppingListIngredient.objects.expected()
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in (
+                ShoppingListIngredient.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                )
+            )
+        }
+        if expected != actual:
+            errors.append('Списки покупок разошлись с таблицей ShoppingCart')
+        return errors
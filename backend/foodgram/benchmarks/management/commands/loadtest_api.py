@@ -0,0 +1,255 @@
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from benchmarks.datasets import DATASETS, seed
+from benchmarks.management.commands.benchmark_api import BENCHMARK_CACHES
+
+HOST = '127.0.0.1'
+# Команды запуска сервера с одинаковым числом процессов.
+SERVERS = {
+    'wsgi': [
+        '-m', 'gunicorn', 'foodgram.wsgi:application',
+        '--bind', '{host}:{port}', '--workers', '{workers}',
+        '--log-level', 'warning',
+    ],
+    'asgi': [
+        '-m', 'uvicorn', 'foodgram.asgi:application',
+        '--host', '{host}', '--port', '{port}', '--workers', '{workers}',
+        '--log-level', 'warning',
+    ],
+}
+STARTUP_TIMEOUT = 30
+SEARCHES = ('мол', 'мук', 'сах', 'тамат')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(
+                f'Сервер завершился с кодом {process.returncode}'
+            )
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f'Сервер не запустился за {STARTUP_TIMEOUT} с')
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест горячих маршрутов чтения (теги, поиск '
+        'ингредиентов, рецепт) на gunicorn (WSGI) и uvicorn (ASGI) с '
+        'одинаковым числом процессов и одновременных клиентов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset', choices=sorted(DATASETS), default='small',
+            help='Размер набора данных',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов сервера',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=32,
+            help='Количество одновременных клиентов',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность теста каждого сервера, с',
+        )
+        parser.add_argument(
+            '--only', choices=sorted(SERVERS), nargs='*',
+            default=sorted(SERVERS, reverse=True),
+            help='Проверить только перечисленные серверы',
+        )
+
+    def handle(self, *args, **options):
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # Серверы работают в отдельных процессах.
+                test_settings['NAME'] = os.path.join(directory, 'db.sqlite3')
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                with override_settings(
+                    MEDIA_ROOT=directory, CACHES=BENCHMARK_CACHES,
+                    DATABASE_REPLICAS=[],
+                ):
+                    dataset = seed(DATASETS[options['dataset']])
+                connections.close_all()
+                environ = self.server_environ(directory)
+                paths = self.paths(dataset)
+                token = dataset.token(dataset.reader)
+                results = {
+                    server: self.run_server(
+                        server, environ, paths, token, options
+                    )
+                    for server in options['only']
+                }
+            finally:
+                connections.close_all()
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.report(results)
+
+    @staticmethod
+    def server_environ(directory):
+        """Переменные окружения серверов: тестовая база и отдельный кеш."""
+        return {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'foodgram.settings'
+            ),
+            'DB_ENGINE': connection.settings_dict['ENGINE'],
+            'DB_NAME': connection.settings_dict['NAME'],
+            'DB_REPLICA_HOSTS': '',
+            'DB_REPLICA_NAMES': '',
+            'CACHE_BACKEND': (
+                'django.core.cache.backends.filebased.FileBasedCache'
+            ),
+            'CACHE_LOCATION': os.path.join(directory, 'cache'),
+            'STATE_CACHE_BACKEND': (
+                'django.core.cache.backends.filebased.FileBasedCache'
+            ),
+            'STATE_CACHE_LOCATION': os.path.join(directory, 'state'),
+        }
+
+    @staticmethod
+    def paths(dataset):
+        return [
+            '/api/tags/',
+            *(f'/api/ingredients/?name={quote(name)}' for name in SEARCHES),
+            *(f'/api/recipes/{pk}/' for pk in dataset.recipe_ids[:50]),
+        ]
+
+    def run_server(self, server, environ, paths, token, options):
+        port = free_port()
+        command = [sys.executable] + [
+            part.format(host=HOST, port=port, workers=options['workers'])
+            for part in SERVERS[server]
+        ]
+        process = subprocess.Popen(
+            command, cwd=settings.BASE_DIR, env=environ,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port, process)
+            # Прогрев: загрузка приложения и кешей процессов.
+            for path in paths:
+                self.send(port, path, token)
+            result = self.load(
+                port, paths, token, options['concurrency'],
+                options['duration'],
+            )
+        finally:
+            process.terminate()
+            process.wait()
+        self.stdout.write(f'{server}: {result["requests"]} запросов')
+        return result
+
+    @staticmethod
+    def send(port, path, token, client=None):
+        client = client or http.client.HTTPConnection(HOST, port, timeout=30)
+        client.request('GET', path, headers={
+            'Authorization': f'Token {token}',
+        })
+        response = client.getresponse()
+        response.read()
+        return response.status
+
+    def load(self, port, paths, token, concurrency, duration):
+        """Клиенты по очереди запрашивают paths до истечения duration
+        секунд. Возвращает число запросов в секунду, процентили времени
+        ответа и статусы.
+        """
+        times = []
+        statuses = []
+        barrier = threading.Barrier(concurrency + 1)
+
+        def client(number):
+            connection = http.client.HTTPConnection(HOST, port, timeout=30)
+            barrier.wait()
+            position = number
+            while time.monotonic() < deadline:
+                path = paths[position % len(paths)]
+                position += 1
+                start = time.perf_counter()
+                try:
+                    status = self.send(port, path, token, connection)
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    status = 'ошибка'
+                times.append((time.perf_counter() - start) * 1000)
+                statuses.append(status)
+            connection.close()
+
+        workers = [
+            threading.Thread(target=client, args=(number,))
+            for number in range(concurrency)
+        ]
+        for worker in workers:
+            worker.start()
+        deadline = time.monotonic() + duration
+        barrier.wait()
+        start = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        percentiles = statistics.quantiles(times, n=100)
+        return {
+            'requests': len(times),
+            'rps': len(times) / elapsed,
+            'p50_ms': percentiles[49],
+            'p95_ms': percentiles[94],
+            'p99_ms': percentiles[98],
+            'statuses': dict(Counter(statuses)),
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"сервер":<8}{"запросов/с":>12}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"p99, мс":>10}  статусы'
+        )
+        for server, result in results.items():
+            statuses = ', '.join(
+                f'{status}: {count}'
+                for status, count in result['statuses'].items()
+            )
+            self.stdout.write(
+                f'{server:<8}{result["rps"]:>12.0f}{result["p50_ms"]:>10.1f}'
+                f'{result["p95_ms"]:>10.1f}{result["p99_ms"]:>10.1f}'
+                f'  {statuses}'
+            )
+        failed = {
+            server for server, result in results.items()
+            if set(result['statuses']) != {200}
+        }
+        if failed:
+            raise CommandError(
+                'Неуспешные ответы: ' + ', '.join(sorted(failed))
+            )
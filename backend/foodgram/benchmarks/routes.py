@@ -0,0 +1,394 @@
+import base64
+from urllib.parse import quote, urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from rest_framework.authtoken.models import Token
+
+from .datasets import PASSWORD
+from api.utils import change_counter
+from recipes.models import (Favorite, Follow, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListIngredient)
+
+User = get_user_model()
+
+IMAGE_PNG = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAAFklEQVR4nGM8YWTEwMDAxMDA'
+    'wMDAAAAO0AEwUN+6GAAAAABJRU5ErkJggg=='
+)
+IMAGE_DATA = 'data:image/png;base64,' + IMAGE_PNG
+
+# Маршруты api/urls.py, которые намеренно не замеряются.
+SKIPPED_ROUTES = {
+    'users-activation': 'отправка писем, активация отключена',
+    'users-resend-activation': 'отправка писем, активация отключена',
+    'users-reset-password': 'отправка писем',
+    'users-reset-password-confirm': 'требует токен из письма',
+    'users-reset-username': 'отправка писем',
+    'users-reset-username-confirm': 'требует токен из письма',
+    'users-set-username': 'меняет логин пользователя сценариев',
+}
+
+
+class Scenario:
+    """Один замеряемый запрос к API.
+
+    setup вызывается перед каждым повтором и возвращает состояние, которое
+    получают path, data и teardown; время setup и teardown не учитывается.
+    """
+
+    def __init__(self, name, route, path, method='get', user='reader',
+                 data=None, status=200, setup=None, teardown=None):
+        self.name = name
+        self.route = route
+        self.path = path
+        self.method = method
+        self.user = user
+        self.data = data
+        self.status = status
+        self.setup = setup
+        self.teardown = teardown
+
+
+def cursor(position):
+    """Курсор CursorPagination, указывающий на запись с id=position."""
+    return quote(
+        base64.b64encode(urlencode({'p': position}).encode()).decode()
+    )
+
+
+def deep_cursor(dataset):
+    """Курсор страницы, соответствующей page=50&limit=6."""
+    return cursor(dataset.recipe_ids[-min(300, len(dataset.recipe_ids))])
+
+
+def create_recipe(dataset, with_file=False):
+    recipe = Recipe(
+        name='Рецепт для замера',
+        text='Описание',
+        cooking_time=10,
+        author=dataset.reader,
+    )
+    if with_file:
+        recipe.image.save(
+            'benchmark.png',
+            ContentFile(base64.b64decode(IMAGE_PNG)),
+            save=False,
+        )
+    else:
+        recipe.image = 'recipes/benchmark.png'
+    recipe.save()
+    recipe.tags.set(dataset.tags[:2])
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id, amount=5)
+        for ingredient_id in dataset.ingredient_ids[:5]
+    )
+    return recipe
+
+
+def recipe_payload(dataset, count=5):
+    return {
+        'name': 'Новый рецепт',
+        'text': 'Описание нового рецепта',
+        'cooking_time': 15,
+        'image': IMAGE_DATA,
+        'tags': [tag.id for tag in dataset.tags[:2]],
+        'ingredients': [
+            {'id': ingredient_id, 'amount': 10}
+            for ingredient_id in dataset.ingredient_ids[:count]
+        ],
+    }
+
+
+def free_recipe(model, dataset):
+    """Рецепт, которого нет в избранном или списке покупок читателя."""
+    return Recipe.objects.exclude(
+        **{f'{model.__name__.lower()}s__user': dataset.reader}
+    ).order_by('id').first()
+
+
+def toggle_scenarios(model, url_name, route):
+    def add_setup(dataset):
+        return free_recipe(model, dataset)
+
+    def add_teardown(dataset, recipe, response):
+        model.objects.filter(user=dataset.reader, recipe=recipe).delete()
+        change_counter(model, {'recipe': recipe}, -1)
+        if model is ShoppingCart:
+            ShoppingListIngredient.objects.remove_recipe(
+                dataset.reader, recipe
+            )
+
+    def remove_setup(dataset):
+        recipe = free_recipe(model, dataset)
+        model.objects.create(user=dataset.reader, recipe=recipe)
+        change_counter(model, {'recipe': recipe}, 1)
+        if model is ShoppingCart:
+            ShoppingListIngredient.objects.add_recipe(dataset.reader, recipe)
+        return recipe
+
+    return [
+        Scenario(
+            f'{url_name}-add', route,
+            lambda dataset, recipe: f'/api/recipes/{recipe.id}/{url_name}/',
+            method='post', status=201,
+            setup=add_setup, teardown=add_teardown,
+        ),
+        Scenario(
+            f'{url_name}-remove', route,
+            lambda dataset, recipe: f'/api/recipes/{recipe.id}/{url_name}/',
+            method='delete', status=204, setup=remove_setup,
+        ),
+    ]
+
+
+def recipe_page_batch(dataset, state):
+    """Запросы страницы рецепта одним пакетом."""
+    recipe = Recipe.objects.get(pk=dataset.recipe_ids[-1])
+    return {'requests': [
+        {'path': f'/api/recipes/{recipe.id}/'},
+        {'path': '/api/tags/'},
+        {'path': '/api/ingredients/?name=' + quote('мук')},
+        {'path': f'/api/users/{recipe.author_id}/'},
+    ]}
+
+
+def delete_recipe(dataset, recipe, response):
+    Recipe.objects.filter(pk=recipe.pk).delete()
+
+
+def delete_created_recipe(dataset, state, response):
+    Recipe.objects.filter(pk=response.json()['id']).delete()
+
+
+def delete_created_user(dataset, state, response):
+    User.objects.filter(username='benchmark_new').delete()
+
+
+def unfollow(dataset):
+    author = dataset.authors[0]
+    deleted, _ = Follow.objects.filter(
+        user=dataset.reader, author=author
+    ).delete()
+    if deleted:
+        change_counter(Follow, {'author': author}, -1)
+    return author
+
+
+def follow(dataset):
+    author = dataset.authors[0]
+    _, created = Follow.objects.get_or_create(
+        user=dataset.reader, author=author
+    )
+    if created:
+        change_counter(Follow, {'author': author}, 1)
+    return author
+
+
+def reset_password(dataset):
+    dataset.reader.set_password(PASSWORD)
+    dataset.reader.save(update_fields=('password',))
+
+
+def restore_password(dataset, state, response):
+    reset_password(dataset)
+
+
+def logout_user(dataset):
+    user = User.objects.exclude(pk=dataset.reader.pk).order_by('-id').first()
+    Token.objects.filter(user=user).delete()
+    dataset.tokens[user.id] = Token.objects.create(user=user).key
+    return user
+
+
+SCENARIOS = [
+    Scenario('api-root', 'api-root', lambda dataset, state: '/api/'),
+    Scenario(
+        'tags-list', 'tags-list', lambda dataset, state: '/api/tags/',
+        user=None,
+    ),
+    Scenario(
+        'tags-detail', 'tags-detail',
+        lambda dataset, state: f'/api/tags/{dataset.tags[0].id}/',
+        user=None,
+    ),
+    Scenario(
+        'ingredients-list', 'ingredients-list',
+        lambda dataset, state: '/api/ingredients/', user=None,
+    ),
+    Scenario(
+        'ingredients-search', 'ingredients-list',
+        lambda dataset, state: '/api/ingredients/?name=мол', user=None,
+    ),
+    Scenario(
+        'ingredients-search-ranked', 'ingredients-list',
+        lambda dataset, state: '/api/ingredients/?name=тамат&mode=ranked',
+        user=None,
+    ),
+    Scenario(
+        'ingredients-detail', 'ingredients-detail',
+        lambda dataset, state: (
+            f'/api/ingredients/{dataset.ingredient_ids[0]}/'
+        ),
+        user=None,
+    ),
+    Scenario(
+        'recipes-list-anonymous', 'recipes-list',
+        lambda dataset, state: '/api/recipes/', user=None,
+    ),
+    Scenario(
+        'recipes-list', 'recipes-list',
+        lambda dataset, state: '/api/recipes/?page=1&limit=6',
+    ),
+    Scenario(
+        'recipes-list-limit-50', 'recipes-list',
+        lambda dataset, state: '/api/recipes/?limit=50',
+    ),
+    Scenario(
+        'recipes-list-deep-page', 'recipes-list',
+        lambda dataset, state: '/api/recipes/?page=50&limit=6',
+    ),
+    Scenario(
+        'recipes-list-cursor', 'recipes-list',
+        lambda dataset, state: '/api/recipes/?cursor=&limit=6',
+    ),
+    Scenario(
+        'recipes-list-cursor-deep', 'recipes-list',
+        lambda dataset, state: (
+            f'/api/recipes/?cursor={deep_cursor(dataset)}&limit=6'
+        ),
+    ),
+    Scenario(
+        'recipes-list-tags', 'recipes-list',
+        lambda dataset, state: '/api/recipes/?limit=6&' + '&'.join(
+            f'tags={tag.slug}' for tag in dataset.tags[:2]
+        ),
+    ),
+    Scenario(
+        'recipes-list-author', 'recipes-list',
+        lambda dataset, state: (
+            f'/api/recipes/?limit=6&author={dataset.authors[0].id}'
+        ),
+    ),
+    Scenario(
+        'recipes-list-favorited', 'recipes-list',
+        lambda dataset, state: '/api/recipes/?limit=6&is_favorited=1',
+    ),
+    Scenario(
+        'recipes-list-shopping-cart', 'recipes-list',
+        lambda dataset, state: '/api/recipes/?limit=6&is_in_shopping_cart=1',
+    ),
+    Scenario(
+        'recipes-detail', 'recipes-detail',
+        lambda dataset, state: f'/api/recipes/{dataset.recipe_ids[-1]}/',
+    ),
+    Scenario(
+        'batch-recipe-page', 'batch',
+        lambda dataset, state: '/api/batch/',
+        method='post', data=recipe_page_batch,
+    ),
+    Scenario(
+        'recipes-create', 'recipes-list',
+        lambda dataset, state: '/api/recipes/',
+        method='post', status=201,
+        data=lambda dataset, state: recipe_payload(dataset),
+        teardown=delete_created_recipe,
+    ),
+    Scenario(
+        'recipes-update', 'recipes-detail',
+        lambda dataset, recipe: f'/api/recipes/{recipe.id}/',
+        method='patch',
+        data=lambda dataset, recipe: recipe_payload(dataset, count=6),
+        setup=create_recipe, teardown=delete_recipe,
+    ),
+    Scenario(
+        'recipes-destroy', 'recipes-detail',
+        lambda dataset, recipe: f'/api/recipes/{recipe.id}/',
+        method='delete', status=204,
+        setup=lambda dataset: create_recipe(dataset, with_file=True),
+    ),
+    Scenario(
+        'recipes-download-shopping-cart',
+        'recipes-get-download-shopping-cart',
+        lambda dataset, state: '/api/recipes/download_shopping_cart/',
+    ),
+    Scenario(
+        'recipes-download-shopping-cart-csv',
+        'recipes-get-download-shopping-cart',
+        lambda dataset, state: (
+            '/api/recipes/download_shopping_cart/?file_format=csv'
+        ),
+    ),
+    *toggle_scenarios(Favorite, 'favorite', 'recipes-get-favorite'),
+    *toggle_scenarios(
+        ShoppingCart, 'shopping_cart', 'recipes-get-shopping-cart'
+    ),
+    Scenario(
+        'users-list', 'users-list',
+        lambda dataset, state: '/api/users/?page=1&limit=6',
+    ),
+    Scenario(
+        'users-create', 'users-list',
+        lambda dataset, state: '/api/users/',
+        method='post', user=None, status=201,
+        data=lambda dataset, state: {
+            'email': 'benchmark_new@example.com',
+            'username': 'benchmark_new',
+            'first_name': 'Имя',
+            'last_name': 'Фамилия',
+            'password': PASSWORD,
+        },
+        teardown=delete_created_user,
+    ),
+    Scenario(
+        'users-detail', 'users-detail',
+        lambda dataset, state: f'/api/users/{dataset.authors[0].id}/',
+    ),
+    Scenario('users-me', 'users-me', lambda dataset, state: '/api/users/me/'),
+    Scenario(
+        'users-subscriptions', 'users-get-subscriptions',
+        lambda dataset, state: (
+            '/api/users/subscriptions/?page=1&limit=6&recipes_limit=3'
+        ),
+    ),
+    Scenario(
+        'users-subscriptions-cursor', 'users-get-subscriptions',
+        lambda dataset, state: (
+            '/api/users/subscriptions/?cursor=&limit=6&recipes_limit=3'
+        ),
+    ),
+    Scenario(
+        'users-subscribe', 'users-get-subscribe',
+        lambda dataset, author: f'/api/users/{author.id}/subscribe/',
+        method='post', status=201, setup=unfollow,
+    ),
+    Scenario(
+        'users-unsubscribe', 'users-get-subscribe',
+        lambda dataset, author: f'/api/users/{author.id}/subscribe/',
+        method='delete', status=204, setup=follow,
+    ),
+    Scenario(
+        'users-set-password', 'users-set-password',
+        lambda dataset, state: '/api/users/set_password/',
+        method='post', status=204,
+        data=lambda dataset, state: {
+            'current_password': PASSWORD,
+            'new_password': PASSWORD + '-new',
+        },
+        setup=reset_password, teardown=restore_password,
+    ),
+    Scenario(
+        'auth-login', 'login',
+        lambda dataset, state: '/api/auth/token/login/',
+        method='post', user=None,
+        data=lambda dataset, state: {
+            'email': dataset.reader.email, 'password': PASSWORD,
+        },
+    ),
+    Scenario(
+        'auth-logout', 'logout',
+        lambda dataset, state: '/api/auth/token/logout/',
+        method='post', user=lambda dataset, user: user, status=204,
+        setup=logout_user,
+    ),
+]
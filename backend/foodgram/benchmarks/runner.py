@@ -0,0 +1,125 @@
+import json
+import statistics
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+
+API_NAMESPACE = 'api'
+
+
+def api_route_names(resolver=None, inside=False):
+    """Имена всех маршрутов пространства имён api."""
+    names = set()
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            names |= api_route_names(
+                pattern, inside or pattern.namespace == API_NAMESPACE
+            )
+        elif inside and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def uncovered_routes(scenarios, skipped):
+    """Маршруты api, для которых нет ни сценария, ни причины пропуска.
+
+    Маршруты 'user-*' регистрирует роутер djoser, они перекрыты
+    одноимёнными 'users-*' из api/urls.py и недостижимы.
+    """
+    covered = {scenario.route for scenario in scenarios} | set(skipped)
+    return sorted(
+        name for name in api_route_names()
+        if name not in covered and not name.startswith('user-')
+    )
+
+
+def measure(scenario, dataset):
+    """Выполняет один повтор сценария и возвращает замер."""
+    state = scenario.setup(dataset) if scenario.setup else None
+    user = scenario.user
+    if user == 'reader':
+        user = dataset.reader
+    elif callable(user):
+        user = user(dataset, state)
+    headers = {}
+    if user is not None:
+        headers['HTTP_AUTHORIZATION'] = f'Token {dataset.token(user)}'
+    data = scenario.data(dataset, state) if scenario.data else None
+    path = scenario.path(dataset, state)
+    client = Client()
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.generic(
+            scenario.method.upper(),
+            path,
+            json.dumps(data) if data is not None else '',
+            content_type='application/json',
+            **headers,
+        )
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        elapsed = time.perf_counter() - start
+
+    if scenario.teardown:
+        scenario.teardown(dataset, state, response)
+    return {
+        'status': response.status_code,
+        'queries': len(queries.captured_queries),
+        'time_ms': elapsed * 1000,
+        'size': len(content),
+        'sql': [query['sql'] for query in queries.captured_queries],
+    }
+
+
+def run(scenario, dataset, repeat):
+    """Замеряет сценарий несколько раз после одного прогревочного вызова.
+
+    Берутся медиана времени и максимумы числа запросов и размера ответа.
+    """
+    measure(scenario, dataset)
+    samples = [measure(scenario, dataset) for _ in range(repeat)]
+    return {
+        'status': samples[-1]['status'],
+        'queries': max(sample['queries'] for sample in samples),
+        'time_ms': round(
+            statistics.median(sample['time_ms'] for sample in samples), 3
+        ),
+        'size': max(sample['size'] for sample in samples),
+    }
+
+
+def compare(results, baseline, time_tolerance, size_tolerance,
+            time_floor_ms):
+    """Сравнивает результаты с эталоном и возвращает список нарушений."""
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            failures.append(
+                f'{name}: запросов {result["queries"]}, '
+                f'в эталоне {expected["queries"]}'
+            )
+        time_limit = max(
+            expected['time_ms'] * (1 + time_tolerance),
+            expected['time_ms'] + time_floor_ms,
+        )
+        if result['time_ms'] > time_limit:
+            failures.append(
+                f'{name}: время {result["time_ms"]:.1f} мс, '
+                f'допустимо {time_limit:.1f} мс'
+            )
+        size_limit = expected['size'] * (1 + size_tolerance)
+        if result['size'] > size_limit:
+            failures.append(
+                f'{name}: размер ответа {result["size"]} байт, '
+                f'допустимо {size_limit:.0f} байт'
+            )
+    return failures
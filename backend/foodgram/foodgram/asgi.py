@@ -0,0 +1,58 @@
+import os
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+
+class AsyncRoutesASGIHandler(ASGIHandler):
+    """Обработчик ASGI с маршрутами ASGI_URLCONF вместо ROOT_URLCONF."""
+
+    async def send_response(self, response, send):
+        """Потоковый ответ читается по частям в синхронном потоке. Django
+        3.2 перебирает его прямо в цикле событий, где ленивые запросы к БД
+        (файл списка покупок) завершаются SynchronousOnlyOperation.
+        """
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [
+                *(
+                    (header.encode('ascii'), value.encode('latin1'))
+                    for header, value in response.items()
+                ),
+                *(
+                    (b'Set-Cookie', cookie.output(header='').encode().strip())
+                    for cookie in response.cookies.values()
+                ),
+            ],
+        })
+        parts = iter(response)
+        read = sync_to_async(next, thread_sensitive=True)
+        part = await read(parts, None)
+        while part is not None:
+            for chunk, _ in self.chunk_bytes(part):
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            part = await read(parts, None)
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = AsyncRoutesASGIHandler()
@@ -0,0 +1,44 @@
+"""Проверка постоянных соединений с БД перед повторным использованием.
+
+При CONN_MAX_AGE > 0 соединение потока остаётся открытым между запросами
+и закрывается Django после CONN_MAX_AGE секунд жизни. Соединение могло
+быть разорвано сервером БД, балансировщиком или перезапуском PostgreSQL,
+пока поток ждал следующего запроса. Если в настройках БД указано
+CONN_HEALTH_CHECKS, соединение с HealthCheckMixin проверяется простым
+запросом один раз за запрос, при первом обращении к БД, и закрывается,
+если не работает: тогда обращение открывает новое соединение, а не
+завершается ошибкой. Запросы, которые не обращаются к БД (ответы из кеша,
+304), проверок не выполняют. Так же работает встроенная проверка
+CONN_HEALTH_CHECKS в Django 4.1+.
+"""
+
+
+class HealthCheckMixin:
+    """Проверка соединения при первом обращении к БД после начала или
+    окончания запроса (close_old_connections).
+    """
+
+    health_check_done = False
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or self.health_check_done
+            or not self.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            return
+        if not self.in_atomic_block and not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,34 @@
+import asyncio
+
+
+class SyncAndAsyncMiddleware:
+    """Основа промежуточных слоёв, работающих и под WSGI, и под ASGI.
+
+    Синхронный промежуточный слой под ASGI Django выполняет в одном общем
+    потоке вместе со всей цепочкой за ним, и запросы процесса идут по
+    одному. Подкласс определяет call() для синхронной цепочки и acall()
+    для асинхронной; работу с БД и кешем acall() выполняет через
+    sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Как в django.utils.deprecation.MiddlewareMixin: Django
+            # проверяет, что экземпляр - корутинная функция.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.acall(request)
+        return self.call(request)
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def acall(self, request):
+        raise NotImplementedError
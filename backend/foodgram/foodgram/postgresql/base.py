@@ -0,0 +1,10 @@
+"""PostgreSQL с проверкой постоянного соединения при первом обращении к БД
+в запросе (foodgram.connections).
+"""
+from django.db.backends.postgresql import base
+
+from foodgram.connections import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    pass
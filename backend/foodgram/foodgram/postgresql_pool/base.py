@@ -0,0 +1,174 @@
+"""PostgreSQL с пулом соединений, общим для потоков процесса.
+
+Django держит отдельное соединение на каждый поток, поэтому gunicorn с
+--threads открывает workers * threads соединений, большая часть которых
+простаивает. С этим движком соединение берётся из пула процесса при
+первом обращении к БД в запросе и возвращается в пул в конце запроса.
+Соединений у процесса не больше POOL_SIZE; поток, которому не хватило
+соединения, ждёт POOL_TIMEOUT секунд.
+
+Соединение из пула перед выдачей проверяется запросом SELECT 1, если
+включено CONN_HEALTH_CHECKS, и закрывается, если прожило больше
+CONN_MAX_AGE секунд.
+"""
+import os
+import threading
+import time
+from functools import partial
+
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+Database = base.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """Открытые соединения с одной базой данных."""
+
+    def __init__(self, size, timeout, max_age):
+        self.timeout = timeout
+        self.max_age = max_age
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._created = {}
+
+    def expired(self, connection):
+        return (
+            self.max_age is not None
+            and time.monotonic() - self._created[connection] >= self.max_age
+        )
+
+    @staticmethod
+    def usable(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def acquire(self, connect, check):
+        """Свободное соединение из пула или новое, если свободных нет.
+        Возвращает соединение и признак повторного использования.
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise Database.OperationalError(
+                f'Нет свободного соединения в пуле за {self.timeout} с'
+            )
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    connection = connect()
+                    self._created[connection] = time.monotonic()
+                    return connection, False
+                if (
+                    not connection.closed and not self.expired(connection)
+                    and (not check or self.usable(connection))
+                ):
+                    return connection, True
+                self.discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, check=False):
+        try:
+            status = connection.info.transaction_status
+            if (
+                connection.closed or self.expired(connection)
+                or status == extensions.TRANSACTION_STATUS_UNKNOWN
+                or (check and not self.usable(connection))
+            ):
+                self.discard(connection)
+                return
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            with self._lock:
+                self._idle.append(connection)
+        except Database.Error:
+            self.discard(connection)
+        finally:
+            self._slots.release()
+
+    def discard(self, connection):
+        self._created.pop(connection, None)
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self.discard(connection)
+
+
+def get_pool(alias, settings_dict):
+    # После fork соединения родительского процесса не используются.
+    key = (os.getpid(), alias, settings_dict['NAME'])
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(
+                settings_dict['POOL_SIZE'],
+                settings_dict['POOL_TIMEOUT'],
+                settings_dict['CONN_MAX_AGE'],
+            )
+        return _pools[key]
+
+
+def close_pools(database_name):
+    """Закрывает свободные соединения с базой, например перед её
+    удалением.
+    """
+    with _pools_lock:
+        pools = [
+            pool for (_, _, name), pool in _pools.items()
+            if name == database_name
+        ]
+    for pool in pools:
+        pool.close()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connection, reused = self.pool.acquire(
+            partial(super().get_new_connection, conn_params),
+            check=self.settings_dict['CONN_HEALTH_CHECKS'],
+        )
+        if reused:
+            self.isolation_level = self.settings_dict['OPTIONS'].get(
+                'isolation_level', connection.isolation_level
+            )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.release(self.connection, check=self.errors_occurred)
+
+    def close_if_unusable_or_obsolete(self):
+        """Возвращает соединение в пул в начале и в конце каждого
+        запроса.
+        """
+        super().close_if_unusable_or_obsolete()
+        if self.connection is not None and not self.in_atomic_block:
+            self.close()
@@ -0,0 +1,180 @@
+"""Профилирование запросов по выборке.
+
+ProfilingMiddleware для доли REQUEST_PROFILING_SAMPLE_RATE запросов
+замеряет число и время запросов к БД, время сериализаторов
+(ProfiledSerializerMixin), отрисовки ответа и общее время. Результат
+добавляется в заголовок Server-Timing ответа и пишется строкой JSON в
+журнал foodgram.profiling.
+
+Запросы к БД считаются обёрткой выполнения запросов, которая добавляется
+к каждому соединению при подключении, и не зависят от DEBUG и
+connection.queries. Профиль запроса берётся из переменной контекста,
+поэтому учитываются и запросы из других потоков (sync_to_async, пул
+api.async_views). Для запросов вне выборки профилирование стоит одной
+проверки переменной контекста в каждом запросе к БД и вызове
+сериализатора.
+"""
+import json
+import logging
+import random
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from .middleware import SyncAndAsyncMiddleware
+
+logger = logging.getLogger(__name__)
+
+current_profile = ContextVar('current_profile', default=None)
+
+# Метрики в порядке вывода в Server-Timing.
+METRICS = ('db', 'serializer', 'render', 'total')
+
+
+class Profile:
+    """Замеры одного запроса, секунды по метрикам и число запросов к БД."""
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.queries = 0
+        self._open = set()
+
+    def timed(self, name, func, *args, **kwargs):
+        """Вызывает func и добавляет время вызова к метрике name. Вложенные
+        вызовы с той же метрикой не учитываются повторно.
+        """
+        if name in self._open:
+            return func(*args, **kwargs)
+        self._open.add(name)
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.timings[name] += perf_counter() - start
+            self._open.discard(name)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Обёртка выполнения запросов к БД."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings['db'] += perf_counter() - start
+            self.queries += 1
+
+    def server_timing(self):
+        metrics = []
+        for name in METRICS:
+            metric = f'{name};dur={self.timings[name] * 1000:.1f}'
+            if name == 'db':
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+    def record(self, request, response):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'route': match.view_name if match else None,
+            'status': response.status_code,
+            'db_queries': self.queries,
+            **{
+                f'{name}_ms': round(self.timings[name] * 1000, 1)
+                for name in METRICS
+            },
+        }
+
+
+def timed(name, func, *args, **kwargs):
+    profile = current_profile.get()
+    if profile is None:
+        return func(*args, **kwargs)
+    return profile.timed(name, func, *args, **kwargs)
+
+
+def profile_queries(execute, sql, params, many, context):
+    """Обёртка выполнения запросов всех соединений."""
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile(execute, sql, params, many, context)
+
+
+def install_query_profiling(sender, connection, **kwargs):
+    if profile_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(profile_queries)
+
+
+connection_created.connect(install_query_profiling)
+
+
+class ProfiledSerializerMixin:
+    """Время представления и проверки данных сериализатора учитывается в
+    метрике serializer, включая запросы к БД, сделанные при этом.
+    """
+
+    def to_representation(self, instance):
+        return timed('serializer', super().to_representation, instance)
+
+    def is_valid(self, raise_exception=False):
+        return timed(
+            'serializer', super().is_valid, raise_exception=raise_exception
+        )
+
+
+def sampled():
+    rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+    return bool(rate) and random.random() < rate
+
+
+def finish(profile, start, request, response):
+    profile.timings['total'] = perf_counter() - start
+    response['Server-Timing'] = profile.server_timing()
+    logger.info(json.dumps(profile.record(request, response)))
+    return response
+
+
+class ProfilingMiddleware(SyncAndAsyncMiddleware):
+
+    def call(self, request):
+        if not sampled():
+            return self.get_response(request)
+        profile = Profile()
+        token = current_profile.set(profile)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return finish(profile, start, request, response)
+
+    async def acall(self, request):
+        if not sampled():
+            return await self.get_response(request)
+        profile = Profile()
+        token = current_profile.set(profile)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return finish(profile, start, request, response)
+
+    def process_template_response(self, request, response):
+        """Засекает отрисовку ответа DRF: этот метод вызывается последним
+        перед render(), а обработчик после отрисовки - сразу после.
+        """
+        profile = current_profile.get()
+        if profile is None or response.is_rendered:
+            return response
+        start = perf_counter()
+
+        def rendered(response):
+            profile.timings['render'] += perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
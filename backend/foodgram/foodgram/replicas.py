@@ -0,0 +1,180 @@
+"""Чтение из реплик БД с чтением своих записей.
+
+ReplicaMiddleware выбирает для каждого запроса с безопасным методом
+(GET, HEAD, OPTIONS) одну из доступных реплик, PrimaryReplicaRouter
+направляет в неё чтение, а запись - всегда в основную БД. Если во время
+такого запроса что-то записывается, остальные чтения этого запроса тоже
+идут в основную БД.
+
+После запроса с записью клиент (по заголовку Authorization или cookie
+сессии) DATABASE_REPLICA_STICKY_SECONDS секунд читает из основной БД,
+чтобы видеть свои изменения до того, как они дойдут до реплик. Токены и
+сессии всегда читаются из основной БД: после входа новый токен может ещё
+отсутствовать в реплике. Отметки о записи хранятся в кеше state, из
+которого записи не вытесняются.
+
+Данные, которые сохраняются в кеш под текущей версией (recipes.versions),
+читаются из основной БД (primary_reads): версия меняется после фиксации
+записи в основной БД, и отстающая реплика сохранила бы под новой версией
+старые данные до следующего изменения.
+
+Реплика проверяется подключением перед первым использованием. Реплика,
+к которой не удалось подключиться или запрос к которой завершился
+ошибкой подключения, исключается из выбора на
+DATABASE_REPLICA_RETRY_SECONDS секунд и затем проверяется заново.
+"""
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+from .middleware import SyncAndAsyncMiddleware
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY_PREFIX = 'db-primary'
+# Модели, которые всегда читаются из основной БД.
+PRIMARY_MODELS = {'authtoken.token', 'sessions.session'}
+
+read_alias = ContextVar('read_alias', default=None)
+
+
+class ReplicaHealth:
+    """Состояние реплик в памяти процесса: проверенные подключением и
+    недоступные до указанного времени.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._alive = set()
+        self._down_until = {}
+
+    def mark_down(self, alias):
+        with self._lock:
+            self._alive.discard(alias)
+            self._down_until[alias] = (
+                time.monotonic() + settings.DATABASE_REPLICA_RETRY_SECONDS
+            )
+
+    def check(self, alias):
+        try:
+            connections[alias].ensure_connection()
+        except OperationalError:
+            self.mark_down(alias)
+            return False
+        with self._lock:
+            self._alive.add(alias)
+        return True
+
+    def choose(self):
+        """Случайная доступная реплика или None, если доступных нет."""
+        now = time.monotonic()
+        candidates = [
+            alias for alias in settings.DATABASE_REPLICAS
+            if self._down_until.get(alias, 0) <= now
+        ]
+        random.shuffle(candidates)
+        for alias in candidates:
+            if alias in self._alive or self.check(alias):
+                return alias
+        return None
+
+
+health = ReplicaHealth()
+
+
+@contextmanager
+def primary_reads():
+    """Чтение внутри блока идёт из основной БД."""
+    token = read_alias.set(None)
+    try:
+        yield
+    finally:
+        read_alias.reset(token)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        read_alias.set(None)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def sticky_key(request):
+    """Ключ клиента для закрепления за основной БД или None для
+    анонимных запросов.
+    """
+    credential = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credential:
+        return None
+    digest = hashlib.sha256(credential.encode()).hexdigest()
+    return f'{STICKY_KEY_PREFIX}:{digest}'
+
+
+def choose_alias(request):
+    """Реплика для чтения в запросе или None - читать из основной БД."""
+    if request.method not in SAFE_METHODS:
+        return None
+    key = sticky_key(request)
+    if key is not None and caches['state'].get(key):
+        return None
+    return health.choose()
+
+
+def remember_write(request):
+    """После запроса с записью клиент читает из основной БД."""
+    key = sticky_key(request)
+    if key is not None and request.method not in SAFE_METHODS:
+        caches['state'].set(
+            key, True, settings.DATABASE_REPLICA_STICKY_SECONDS
+        )
+
+
+class ReplicaMiddleware(SyncAndAsyncMiddleware):
+
+    def call(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        token = read_alias.set(choose_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        remember_write(request)
+        return response
+
+    async def acall(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        token = read_alias.set(await sync_to_async(choose_alias)(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_alias.reset(token)
+        await sync_to_async(remember_write)(request)
+        return response
+
+    def process_exception(self, request, exception):
+        alias = read_alias.get()
+        if alias is not None and isinstance(exception, OperationalError):
+            health.mark_down(alias)
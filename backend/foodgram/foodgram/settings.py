@@ -1,4 +1,5 @@
 import os
+from itertools import zip_longest
 
 from dotenv import load_dotenv
 
@@ -19,15 +20,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
     'recipes.apps.RecipesConfig',
+    'tasks.apps.TasksConfig',
+    'benchmarks.apps.BenchmarksConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -56,6 +62,13 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+# ASGI-приложение (uvicorn foodgram.asgi:application) со своими маршрутами:
+# горячие маршруты чтения асинхронные (api.async_views) и выполняют работу
+# с БД в пуле из ASYNC_VIEW_THREADS потоков.
+ASGI_APPLICATION = 'foodgram.asgi.application'
+ASGI_URLCONF = 'foodgram.urls_asgi'
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', default=8))
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv(
@@ -65,10 +78,148 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', default='foodgram_user'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='Ldbljeb'),
         'HOST': os.getenv('DB_HOST', default='127.0.0.1'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': (
+            os.getenv('DB_CONN_HEALTH_CHECKS', default='true').lower()
+            == 'true'
+        ),
+    }
+}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Тесты пишут в базу из нескольких потоков, а база SQLite в памяти
+    # одновременной записи из разных соединений не допускает.
+    DATABASES['default']['TEST'] = {
+        'NAME': os.path.join(BASE_DIR, 'test.sqlite3'),
     }
+
+# Постоянные соединения (foodgram.connections): DB_CONN_MAX_AGE - время
+# жизни соединения в секундах (0 - новое соединение на каждый запрос),
+# DB_CONN_HEALTH_CHECKS - проверка соединения перед повторным
+# использованием. DB_POOL_SIZE > 0 включает для PostgreSQL пул соединений,
+# общий для потоков процесса (gunicorn с --threads), DB_POOL_TIMEOUT -
+# сколько секунд поток ждёт свободного соединения.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', default=0))
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['ENGINE'] = 'foodgram.postgresql'
+    if DB_POOL_SIZE:
+        DATABASES['default'].update(
+            ENGINE='foodgram.postgresql_pool',
+            POOL_SIZE=DB_POOL_SIZE,
+            POOL_TIMEOUT=float(os.getenv('DB_POOL_TIMEOUT', default=10)),
+        )
+
+# Реплики только для чтения (foodgram.replicas): хосты PostgreSQL в
+# DB_REPLICA_HOSTS и/или имена баз в DB_REPLICA_NAMES через запятую
+# (для SQLite - пути к файлам). Остальные параметры берутся из default.
+# Время, в течение которого клиент после записи читает из основной БД,
+# и через сколько секунд повторно проверяется недоступная реплика.
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host
+]
+DB_REPLICA_NAMES = [
+    name for name in os.getenv('DB_REPLICA_NAMES', '').split(',') if name
+]
+for number, (host, name) in enumerate(
+    zip_longest(DB_REPLICA_HOSTS, DB_REPLICA_NAMES), start=1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host or DATABASES['default']['HOST'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['foodgram.replicas.PrimaryReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.getenv('DB_REPLICA_STICKY_SECONDS', default=10)
+)
+DATABASE_REPLICA_RETRY_SECONDS = 30
+
+# Кеши общие для всех процессов сервера. default - ответы и количества
+# объектов, старые записи из него вытесняются. state - версии данных, по
+# которым процессы инвалидируют свои кеши, и закрепление клиентов за
+# основной БД (foodgram.replicas); записей в нём немного, и вытесняться они
+# не должны, поэтому у файлового кеша большой MAX_ENTRIES.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', default=os.path.join(BASE_DIR, '.cache')
+        ),
+    },
+    'state': {
+        'BACKEND': os.getenv(
+            'STATE_CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'STATE_CACHE_LOCATION',
+            default=os.path.join(BASE_DIR, '.cache', 'state'),
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 1000000},
+    },
 }
 
+# Ранжированный поиск ингредиентов: количество результатов по умолчанию,
+# максимальное и минимальная схожесть по триграммам.
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SEARCH_MAX_LIMIT = 50
+INGREDIENT_SEARCH_SIMILARITY = 0.3
+
+# Общее количество объектов при постраничном выводе: время хранения
+# точного значения в кеше, с; с какого размера таблицы без фильтров
+# отдаётся оценка планировщика PostgreSQL.
+PAGINATION_COUNT_CACHE_TIMEOUT = 300
+PAGINATION_ESTIMATE_THRESHOLD = 100000
+
+# Время хранения в кеше ответов публичных списков (api.response_cache), с.
+RESPONSE_CACHE_TIMEOUT = 600
+
+# Профилирование запросов (foodgram.profiling): доля запросов, для которых
+# замеряется время БД, сериализаторов и отрисовки ответа (0 - выключено,
+# 1 - все запросы). Замеры добавляются в заголовок Server-Timing и пишутся
+# в журнал foodgram.profiling.
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.getenv('REQUEST_PROFILING_SAMPLE_RATE', default=0)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Наибольшее количество вложенных запросов в /api/batch/.
+API_BATCH_MAX_REQUESTS = 20
+
+# Уменьшенные копии изображений рецептов: название и ширина в пикселях.
+RECIPE_IMAGE_DERIVATIVES = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 1080,
+}
+RECIPE_IMAGE_QUALITY = 80
+
+# Фоновые задачи: число попыток, задержка перед первым повтором и
+# максимальная задержка в секундах, число потоков обработчика.
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BACKOFF = 10
+TASK_MAX_BACKOFF = 3600
+TASK_WORKER_CONCURRENCY = 2
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.db.backends.sqlite3 import base
+from django.test import SimpleTestCase
+
+from foodgram.connections import HealthCheckMixin
+
+
+class DatabaseWrapper(HealthCheckMixin, base.DatabaseWrapper):
+    pass
+
+
+class HealthCheckTests(SimpleTestCase):
+    """Соединение проверяется один раз за запрос при первом обращении к БД
+    и заменяется новым, если не работает.
+    """
+
+    def setUp(self):
+        # Соединение с базой SQLite в памяти не закрывается.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.wrapper = DatabaseWrapper({
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+            'ATOMIC_REQUESTS': False,
+            'AUTOCOMMIT': True,
+            'CONN_MAX_AGE': None,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+            'TIME_ZONE': None,
+            'USER': '',
+            'PASSWORD': '',
+            'HOST': '',
+            'PORT': '',
+        })
+        self.addCleanup(self.wrapper.close)
+
+    def query(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def test_checked_once_on_first_use(self):
+        self.query()
+        with mock.patch.object(
+            self.wrapper, 'is_usable', return_value=True
+        ) as is_usable:
+            self.wrapper.close_if_unusable_or_obsolete()
+            is_usable.assert_not_called()
+            self.query()
+            self.query()
+            is_usable.assert_called_once()
+
+    def test_new_connection_not_checked(self):
+        with mock.patch.object(self.wrapper, 'is_usable') as is_usable:
+            self.wrapper.close_if_unusable_or_obsolete()
+            self.query()
+            is_usable.assert_not_called()
+
+    def test_unusable_connection_replaced(self):
+        self.query()
+        old_connection = self.wrapper.connection
+        self.wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(
+            self.wrapper, 'is_usable', return_value=False
+        ):
+            self.query()
+        self.assertIsNot(self.wrapper.connection, old_connection)
@@ -0,0 +1,10 @@
+"""Маршруты ASGI-приложения: горячие маршруты чтения API асинхронные
+(api.async_views), остальные совпадают с foodgram.urls.
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('api.urls_asgi'))
+]
@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.db import transaction
 
 from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, RecipeTag, ShoppingCart, Tag)
+                            RecipeIngredient, RecipeTag, ShoppingCart,
+                            ShoppingListIngredient, Tag)
+from recipes.versions import bump_version
 
 
 class RecipeTagInline(admin.TabularInline):
@@ -49,7 +52,7 @@ class RecipeAdmin(admin.ModelAdmin):
     )
 
     def count_favorite(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     count_favorite.short_description = 'Количество добавлений в избранное'
 
@@ -67,6 +70,14 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('id', 'recipe', 'ingredient',)
     search_fields = ('recipe',)
 
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        """Удаление выбранных строк отмечает их рецепты изменёнными."""
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        queryset.delete()
+        bump_version(RecipeIngredient)
+        Recipe.objects.touch(recipe_ids)
+
 
 class FollowAdmin(admin.ModelAdmin):
     """Класс для работы с подписками в админ-панели."""
@@ -82,6 +93,13 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     search_fields = ('user', 'recipe', )
 
 
+class ShoppingListIngredientAdmin(admin.ModelAdmin):
+    """Класс для просмотра суммарных списков покупок в админ-панели."""
+
+    list_display = ('id', 'user', 'ingredient', 'amount',)
+    search_fields = ('user__username', 'ingredient__name',)
+
+
 class FavoriteAdmin(admin.ModelAdmin):
     """Класс для работы избранными рецептами в админ-панели."""
 
@@ -95,5 +113,6 @@ admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Follow, FollowAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
+admin.site.register(ShoppingListIngredient, ShoppingListIngredientAdmin)
 admin.site.register(RecipeTag, RecipeTagAdmin)
 admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
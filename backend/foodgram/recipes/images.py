@@ -0,0 +1,86 @@
+"""Уменьшенные копии изображений рецептов.
+
+Для каждого изображения один раз создаются копии фиксированной ширины
+(settings.RECIPE_IMAGE_DERIVATIVES) в форматах WebP и JPEG без
+метаданных. Имена копий выводятся из имени оригинала, поэтому в БД
+хранится только признак того, что копии созданы.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+DERIVATIVES_DIR = 'recipes/derivatives'
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def derivative_name(name, derivative, extension):
+    """recipes/photo.png -> recipes/derivatives/photo.png.card.webp"""
+    return (
+        f'{DERIVATIVES_DIR}/{os.path.basename(name)}.{derivative}.{extension}'
+    )
+
+
+def derivative_names(name):
+    return [
+        derivative_name(name, derivative, extension)
+        for derivative in settings.RECIPE_IMAGE_DERIVATIVES
+        for extension in FORMATS
+    ]
+
+
+def resize(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def encode(image, image_format):
+    """Кодирует изображение; метаданные (EXIF, ICC) не переносятся."""
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        if image.mode in ('RGBA', 'LA'):
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(
+        buffer, image_format,
+        quality=settings.RECIPE_IMAGE_QUALITY, optimize=True,
+    )
+    return buffer.getvalue()
+
+
+def create_derivatives(name, storage=default_storage):
+    """Создаёт все копии изображения name, заменяя существующие."""
+    with storage.open(name) as fdata:
+        with Image.open(fdata) as original:
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert(
+                    'RGBA' if 'transparency' in image.info
+                    or image.mode in ('LA', 'PA') else 'RGB'
+                )
+            for derivative, width in (
+                settings.RECIPE_IMAGE_DERIVATIVES.items()
+            ):
+                resized = resize(image, width)
+                for extension, image_format in FORMATS.items():
+                    path = derivative_name(name, derivative, extension)
+                    storage.delete(path)
+                    storage.save(
+                        path, ContentFile(encode(resized, image_format))
+                    )
+    return name
+
+
+def derivative_urls(name, derivative, storage=default_storage):
+    return {
+        extension: storage.url(derivative_name(name, derivative, extension))
+        for extension in FORMATS
+    }
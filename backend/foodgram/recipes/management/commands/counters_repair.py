@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe, UserStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт счётчиков рецептов (избранное, список покупок) и '
+        'пользователей (рецепты, подписчики)'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = Recipe.objects.recount()
+            users = UserStats.objects.recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено рецептов: {recipes}, пользователей: {users}.'
+        ))
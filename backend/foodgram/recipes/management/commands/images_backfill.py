@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from recipes.images import create_derivatives
+from recipes.models import Recipe
+from recipes.versions import bump_version
+
+UPDATE_BATCH_SIZE = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Создание уменьшенных копий изображений рецептов, для которых '
+        'они ещё не созданы'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Количество процессов, по умолчанию по числу ядер',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии для всех изображений',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['force']:
+            recipes = recipes.filter(has_image_derivatives=False)
+        names = {}
+        for pk, name in recipes.values_list('id', 'image').iterator():
+            names.setdefault(name, []).append(pk)
+        if not names:
+            self.stdout.write('Все копии уже созданы.')
+            return
+
+        # Дочерние процессы работают только с файлами, открытые
+        # соединения с БД не должны им достаться.
+        connections.close_all()
+        pending, failed = [], 0
+        with ProcessPoolExecutor(options['workers']) as executor:
+            futures = {
+                executor.submit(create_derivatives, name): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                pending.extend(names[name])
+                if len(pending) >= UPDATE_BATCH_SIZE:
+                    self.mark_done(pending)
+        self.mark_done(pending)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {len(names) - failed}, '
+            f'ошибок: {failed}.'
+        ))
+
+    @staticmethod
+    def mark_done(ids):
+        if not ids:
+            return
+        Recipe.objects.filter(id__in=ids).update(
+            has_image_derivatives=True, updated=timezone.now()
+        )
+        bump_version(Recipe)
+        ids.clear()
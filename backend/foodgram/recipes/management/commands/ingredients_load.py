@@ -1,25 +1,177 @@
 import csv
+import io
+import json
+import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
 
 from recipes.models import Ingredient
+from recipes.trigrams import update_trigrams
+from recipes.versions import bump_version
+
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+
+
+def read_csv(path):
+    with open(path, encoding='utf-8-sig', newline='') as fdata:
+        for row in csv.reader(fdata):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    """Записи из JSON-массива объектов или из файла с объектом на строку.
+
+    Файл читается кусками и разбирается по одному объекту, поэтому
+    целиком в памяти не хранится.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    with open(path, encoding='utf-8-sig') as fdata:
+        while True:
+            chunk = fdata.read(READ_SIZE)
+            buffer = (buffer + chunk).lstrip(' \t\r\n[,]')
+            while buffer:
+                try:
+                    record, end = decoder.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    if not chunk:
+                        raise CommandError('Некорректный JSON в файле.')
+                    break
+                yield record.get('name', ''), record.get(
+                    'measurement_unit', ''
+                )
+                buffer = buffer[end:].lstrip(' \t\r\n[,]')
+            if not chunk:
+                return
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+def clean(rows):
+    for name, measurement_unit in rows:
+        name, measurement_unit = name.strip(), measurement_unit.strip()
+        if name and measurement_unit:
+            yield name, measurement_unit
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(dict.fromkeys(islice(rows, size)))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_bulk(batch):
+    """bulk_create без конфликтующих строк и триграммы для новых."""
+    last_id = Ingredient.objects.aggregate(last_id=Max('id'))['last_id']
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in batch
+        ),
+        ignore_conflicts=True,
+    )
+    update_trigrams(
+        Ingredient.objects.filter(id__gt=last_id or 0).only('id', 'name')
+    )
+
+
+def insert_copy(batch):
+    """COPY во временную таблицу и перенос новых строк одним INSERT."""
+    table = Ingredient._meta.db_table
+    data = io.StringIO()
+    csv.writer(data).writerows(batch)
+    data.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE IF NOT EXISTS ingredients_load '
+            '(name text, measurement_unit text) ON COMMIT DROP'
+        )
+        cursor.execute('TRUNCATE ingredients_load')
+        cursor.copy_expert(
+            'COPY ingredients_load (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv)',
+            data,
+        )
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT name, measurement_unit FROM ingredients_load '
+            'ON CONFLICT (name, measurement_unit) DO NOTHING'
+        )
 
 
 class Command(BaseCommand):
-    help = 'Загрузка ингредиентов'
+    help = (
+        'Загрузка ингредиентов из CSV или JSON. Уже существующие '
+        'ингредиенты пропускаются, поэтому загрузку можно повторять'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
             'path_data', type=str, help='Путь к файлу с ингредиентами'
         )
+        parser.add_argument(
+            '--format', choices=sorted(ext[1:] for ext in READERS),
+            dest='file_format',
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Количество строк в одной пачке',
+        )
 
     def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
         path_data = options.get('path_data')
+        extension = '.' + (
+            options['file_format']
+            or os.path.splitext(path_data)[1].lstrip('.').lower()
+        )
+        if extension not in READERS:
+            raise CommandError(
+                'Неизвестный формат файла, укажите --format.'
+            )
+        if not os.path.exists(path_data):
+            raise CommandError(f'Файл {path_data} не найден.')
+        insert = (
+            insert_copy if connection.vendor == 'postgresql' else insert_bulk
+        )
 
-        with open(path_data, 'r') as fdata:
-            data = csv.reader(fdata)
-            fields = ['name', 'measurement_unit']
-            for row in data:
-                record = dict(zip(fields, row))
-                m = Ingredient(**record)
-                m.save()
+        start = time.perf_counter()
+        processed = 0
+        with transaction.atomic():
+            before = Ingredient.objects.count()
+            for batch in batches(
+                clean(READERS[extension](path_data)), options['batch_size']
+            ):
+                insert(batch)
+                processed += len(batch)
+                self.progress(processed, start)
+            inserted = Ingredient.objects.count() - before
+            if inserted:
+                bump_version(Ingredient)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {processed}, добавлено: {inserted}, '
+            f'пропущено: {processed - inserted}. '
+            f'Время: {elapsed:.2f} с, {processed / elapsed:.0f} строк/с.'
+        ))
+
+    def progress(self, processed, start):
+        if self.verbosity < 1:
+            return
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'Обработано строк: {processed}, '
+            f'{processed / elapsed:.0f} строк/с'
+        )
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка согласованности суммарных списков покупок с таблицей '
+        'ShoppingCart и их пересборка'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересобрать списки вместо проверки',
+        )
+        parser.add_argument(
+            '--user', type=int, nargs='*', dest='user_ids',
+            help='Ограничиться пользователями с указанными id',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options.get('user_ids')
+        if options.get('rebuild'):
+            ShoppingListIngredient.objects.rebuild(user_ids)
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок пересобраны.')
+            )
+            return
+
+        expected = ShoppingListIngredient.objects.expected(user_ids)
+        rows = ShoppingListIngredient.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in rows.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        mismatches = sorted(
+            key for key in set(expected) | set(actual)
+            if expected.get(key) != actual.get(key)
+        )
+        for user_id, ingredient_id in mismatches:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидается {expected.get((user_id, ingredient_id), 0)}, '
+                f'в таблице {actual.get((user_id, ingredient_id), 0)}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Расхождений: {len(mismatches)}. '
+                'Запустите команду с --rebuild.'
+            )
+        self.stdout.write(self.style.SUCCESS('Списки покупок согласованы.'))
@@ -0,0 +1,70 @@
+# Generated by Django 3.2 on 2026-10-18 04:30
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipes.trigrams import trigrams
+
+TRIGRAM_INDEX = 'recipes_ingredient_name_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} '
+        'ON recipes_ingredient USING gin (name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+def fill_trigrams(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientTrigram = apps.get_model('recipes', 'IngredientTrigram')
+    IngredientTrigram.objects.bulk_create(
+        (
+            IngredientTrigram(ingredient_id=ingredient_id, trigram=trigram)
+            for ingredient_id, name in Ingredient.objects.values_list(
+                'id', 'name'
+            )
+            for trigram in trigrams(name)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppinglistingredient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(db_index=True, max_length=3, verbose_name='Триграмма')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='recipes.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Триграмма ингредиента',
+                'verbose_name_plural': 'Триграммы ингредиентов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ingredienttrigram',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'trigram'), name='unique_ingredient_trigram'),
+        ),
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(fill_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='has_image_derivatives',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Созданы уменьшенные копии изображения'),
+        ),
+    ]
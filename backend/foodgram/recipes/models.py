@@ -1,9 +1,13 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connections, models, router, transaction
+from django.db.models import (Count, F, OuterRef, Q, Subquery, Sum,
+                              UniqueConstraint)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
 
 from .validators import validate_amount
+from .versions import bump_version
 
 User = get_user_model()
 
@@ -52,11 +56,133 @@ class Ingredient(models.Model):
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
         ordering = ['name']
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class IngredientTrigram(models.Model):
+    """Модель триграмм названий ингредиентов для нечёткого поиска на СУБД
+    без pg_trgm.
+    """
+
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='trigrams',
+        verbose_name='Ингредиент',
+    )
+    trigram = models.CharField(
+        max_length=3,
+        db_index=True,
+        verbose_name='Триграмма',
+    )
+
+    class Meta:
+        verbose_name = 'Триграмма ингредиента'
+        verbose_name_plural = 'Триграммы ингредиентов'
+        constraints = [
+            UniqueConstraint(
+                fields=['ingredient', 'trigram'],
+                name='unique_ingredient_trigram',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient.name} - {self.trigram}'
+
+
+def count_subquery(model, field, outer='pk'):
+    """Количество записей model, у которых field равно outer внешнего
+    запроса.
+    """
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef(outer)}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+class CountersManager(models.Manager):
+    """Поддержка счётчиков, хранящихся в полях модели.
+
+    Счётчики меняются одним UPDATE с F(), поэтому параллельные изменения
+    не теряются. Атрибут модели COUNTERS задаёт для каждого поля-счётчика
+    модель и её внешний ключ, по которым счётчик пересчитывается заново.
+    """
+
+    def counters(self):
+        return {
+            field: (self.model._meta.apps.get_model(label), related_field)
+            for field, (label, related_field) in self.model.COUNTERS.items()
+        }
+
+    def change(self, pk, field, delta):
+        """Прибавляет delta к счётчику field записи pk. Счётчик, разошедшийся
+        с данными из-за изменений в обход API, не уходит ниже нуля; точные
+        значения восстанавливает команда counters_repair.
+        """
+        updated = self.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+        if not updated:
+            self.recount([pk])
+
+    def recount(self, pks=None):
+        """Пересчитывает счётчики записей (всех, если pks не указаны) и
+        возвращает количество исправленных записей.
+        """
+        queryset = self.all()
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+        actual = {
+            field: count_subquery(model, related_field)
+            for field, (model, related_field) in self.counters().items()
+        }
+        stale = queryset.annotate(
+            **{f'actual_{field}': value for field, value in actual.items()}
+        ).filter(
+            Q(*(
+                ~Q(**{field: F(f'actual_{field}')}) for field in actual
+            ), _connector=Q.OR)
+        ).values_list('pk', flat=True)
+        return self.filter(pk__in=list(stale)).update(**actual)
+
+
+class RecipeManager(CountersManager):
+
+    def touch(self, pks):
+        """Отмечает рецепты изменёнными, например после изменения их тегов
+        или ингредиентов.
+        """
+        return self.filter(pk__in=pks).update(updated=timezone.now())
+
+    def lock(self, pk):
+        """Блокирует рецепт до конца транзакции. Изменение ингредиентов
+        рецепта, его удаление и добавление в списки покупок выполняются
+        по очереди: иначе изменение не видит ещё не зафиксированную запись
+        ShoppingCart, а добавление - новые количества, и список покупок
+        пользователя расходится с корзиной.
+        """
+        using = router.db_for_write(self.model)
+        queryset = self.using(using).filter(pk=pk)
+        if connections[using].features.has_select_for_update:
+            list(queryset.select_for_update().values_list('pk', flat=True))
+            return
+        # SQLite блокирует запись во всю базу. Блокировку берёт первая же
+        # запись в транзакции: после чтения повышение блокировки при
+        # одновременной записи сразу завершилось бы ошибкой.
+        queryset.update(updated=F('updated'))
+
+
 class Recipe(models.Model):
     """Модель рецепты."""
 
@@ -69,6 +195,11 @@ class Recipe(models.Model):
         upload_to='recipes/',
         verbose_name='Изображение',
     )
+    has_image_derivatives = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Созданы уменьшенные копии изображения',
+    )
     cooking_time = models.PositiveIntegerField(
         validators=[MinValueValidator(1)],
         verbose_name='Время приготовления мин.',
@@ -77,6 +208,26 @@ class Recipe(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
+        db_index=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное',
+    )
+    shoppingcarts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в список покупок',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создан',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Изменён',
     )
     tags = models.ManyToManyField(
         Tag,
@@ -91,10 +242,22 @@ class Recipe(models.Model):
         verbose_name='Ингридиенты',
     )
 
+    objects = RecipeManager()
+
+    COUNTERS = {
+        'favorites_count': ('recipes.Favorite', 'recipe'),
+        'shoppingcarts_count': ('recipes.ShoppingCart', 'recipe'),
+    }
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['author', '-id'], name='recipe_author_id_desc'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -106,10 +269,12 @@ class RecipeTag(models.Model):
     tag = models.ForeignKey(
         Tag,
         on_delete=models.PROTECT,
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
     class Meta:
@@ -122,11 +287,59 @@ class RecipeTag(models.Model):
                 name='unique_recipe_tag',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['tag', 'recipe'], name='recipetag_tag_recipe'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.recipe.name} - {self.tag.name}'
 
 
+class RecipeIngredientManager(models.Manager):
+
+    @transaction.atomic
+    def set_amounts(self, recipe, amounts):
+        """Приводит ингредиенты рецепта к amounts - словарю
+        {id ингредиента: количество}. Добавляются, изменяются и удаляются
+        только отличающиеся строки, каждое действие - одним запросом.
+        Время изменения рецепта обновляет вызывающий код при его
+        сохранении. Возвращает прежние количества ингредиентов рецепта.
+        """
+        existing = {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in self.filter(
+                recipe=recipe
+            ).values_list('id', 'ingredient_id', 'amount')
+        }
+        added = [
+            self.model(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        changed = [
+            self.model(pk=pk, amount=amounts[ingredient_id])
+            for ingredient_id, (pk, amount) in existing.items()
+            if amounts.get(ingredient_id, amount) != amount
+        ]
+        removed = self.filter(pk__in=[
+            pk for ingredient_id, (pk, _) in existing.items()
+            if ingredient_id not in amounts
+        ])
+        self.bulk_create(added)
+        self.bulk_update(changed, ['amount'])
+        deleted, _ = removed.delete()
+        if deleted or added or changed:
+            bump_version(self.model)
+        return {
+            ingredient_id: amount
+            for ingredient_id, (_, amount) in existing.items()
+        }
+
+
 class RecipeIngredient(models.Model):
     """Модель для связи рецепта и ингредиентов."""
 
@@ -135,6 +348,7 @@ class RecipeIngredient(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
         related_name='recipeingredients',
+        db_index=False,
     )
     ingredient = models.ForeignKey(
         Ingredient,
@@ -147,6 +361,8 @@ class RecipeIngredient(models.Model):
         verbose_name='Количество',
     )
 
+    objects = RecipeIngredientManager()
+
     class Meta:
         verbose_name = 'Рецепт - Ингредиент'
         verbose_name_plural = 'Рецепты - Ингредиенты'
@@ -161,6 +377,52 @@ class RecipeIngredient(models.Model):
     def __str__(self):
         return f'{self.recipe.name} - {self.ingredient.name}'
 
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        """Удаление отдельной строки, например в админ-панели, отмечает
+        рецепт изменённым. Обработчика post_delete нет, чтобы строки
+        удалялись одним запросом в set_amounts и вместе с рецептом.
+        """
+        Recipe.objects.touch([self.recipe_id])
+        bump_version(RecipeIngredient)
+        return super().delete(*args, **kwargs)
+
+
+class LinkManager(models.Manager):
+    """Добавление и удаление уникальных связей (подписка, избранное,
+    список покупок) одним запросом без предварительной проверки.
+
+    Повторное добавление не нарушает ограничение уникальности: INSERT
+    выполняется с ON CONFLICT DO NOTHING (INSERT OR IGNORE, INSERT IGNORE),
+    а результат определяется по числу изменённых строк. Из параллельных
+    одинаковых запросов успешен ровно один.
+    """
+
+    def add(self, **attrs):
+        """Создаёт запись; возвращает False, если она уже существует."""
+        connection = connections[
+            self._db or router.db_for_write(self.model)
+        ]
+        quote_name = connection.ops.quote_name
+        columns = [self.model._meta.get_field(name).column for name in attrs]
+        sql = (
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{quote_name(self.model._meta.db_table)} '
+            f'({", ".join(quote_name(column) for column in columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))}) '
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [getattr(value, 'pk', value) for value in attrs.values()]
+            )
+            return cursor.rowcount == 1
+
+    def remove(self, **attrs):
+        """Удаляет запись; возвращает False, если её не было."""
+        deleted, _ = self.filter(**attrs).delete()
+        return bool(deleted)
+
 
 class Follow(models.Model):
     """Модель подписки на авторов."""
@@ -170,14 +432,18 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='follower',
         verbose_name='Пользователь',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='author',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False,
     )
 
+    objects = LinkManager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -185,6 +451,11 @@ class Follow(models.Model):
         constraints = [
             UniqueConstraint(fields=['user', 'author'], name='unique_follow')
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user'
+            ),
+        ]
 
 
 class ShoppingCart(models.Model):
@@ -195,14 +466,18 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shoppingcarts',
         verbose_name='Пользователь',
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='shoppingcarts',
         verbose_name='Рецепт',
+        db_index=False,
     )
 
+    objects = LinkManager()
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
@@ -212,6 +487,11 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'], name='unique_shopingcart'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'], name='shoppingcart_recipe_user'
+            ),
+        ]
 
 
 class Favorite(models.Model):
@@ -222,14 +502,18 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites',
         verbose_name='Пользователь',
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='favorites',
         verbose_name='Рецепт',
+        db_index=False,
     )
 
+    objects = LinkManager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -239,3 +523,230 @@ class Favorite(models.Model):
                 fields=['user', 'recipe'], name='unique_favorite'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'user'], name='favorite_recipe_user'
+            ),
+        ]
+
+
+class ShoppingListManager(models.Manager):
+    """Поддержка агрегированного списка покупок в актуальном состоянии."""
+
+    @staticmethod
+    def recipe_amounts(recipe):
+        """Количество каждого ингредиента в рецепте."""
+        return dict(
+            RecipeIngredient.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', 'amount'
+            )
+        )
+
+    def add_amounts(self, user_ids, amounts):
+        """Прибавляет количества ингредиентов к спискам пользователей.
+
+        amounts - словарь {id ингредиента: изменение количества}, изменение
+        может быть отрицательным. Строки с нулевым итогом удаляются.
+        """
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        user_ids = list(user_ids)
+        if not amounts or not user_ids:
+            return
+        with transaction.atomic():
+            # Блокировка пользователей не даёт параллельным запросам
+            # создать одну и ту же строку списка. Строки блокируются в
+            # порядке id, чтобы запросы с пересекающимися наборами
+            # пользователей не ждали друг друга взаимно.
+            list(
+                User.objects.select_for_update().filter(
+                    id__in=user_ids
+                ).order_by('id').values_list('id', flat=True)
+            )
+            existing = {
+                (row.user_id, row.ingredient_id): row
+                for row in self.filter(
+                    user_id__in=user_ids, ingredient_id__in=amounts
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for user_id in user_ids:
+                for ingredient_id, amount in amounts.items():
+                    row = existing.get((user_id, ingredient_id))
+                    if row is None:
+                        if amount > 0:
+                            to_create.append(self.model(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=amount,
+                            ))
+                        continue
+                    row.amount += amount
+                    if row.amount > 0:
+                        to_update.append(row)
+                    else:
+                        to_delete.append(row.id)
+            self.bulk_create(to_create)
+            self.bulk_update(to_update, ['amount'])
+            if to_delete:
+                self.filter(id__in=to_delete).delete()
+
+    def add_recipe(self, user, recipe):
+        """Рецепт добавлен в список покупок пользователя."""
+        self.add_amounts([user.id], self.recipe_amounts(recipe))
+
+    def remove_recipe(self, user, recipe):
+        """Рецепт удалён из списка покупок пользователя."""
+        self.remove_recipe_for_users([user.id], recipe)
+
+    def remove_recipe_for_users(self, user_ids, recipe):
+        amounts = self.recipe_amounts(recipe)
+        self.add_amounts(
+            user_ids,
+            {ingredient: -amount for ingredient, amount in amounts.items()}
+        )
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Ингредиенты рецепта изменились: пересчитать списки всех
+        пользователей, у которых рецепт лежит в корзине.
+        """
+        delta = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in set(old_amounts) | set(new_amounts)
+        }
+        self.add_amounts(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True
+            ),
+            delta,
+        )
+
+    @staticmethod
+    def expected(user_ids=None):
+        """Итоги по ингредиентам, посчитанные по таблице ShoppingCart."""
+        carts = ShoppingCart.objects.filter(
+            recipe__recipeingredients__isnull=False
+        )
+        if user_ids is not None:
+            carts = carts.filter(user_id__in=user_ids)
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in carts.values_list(
+                'user_id', 'recipe__recipeingredients__ingredient_id'
+            ).annotate(
+                amount=Sum('recipe__recipeingredients__amount')
+            ).order_by()
+        }
+
+    def rebuild(self, user_ids=None):
+        """Полностью пересобирает списки покупок по таблице ShoppingCart."""
+        with transaction.atomic():
+            rows = self.all()
+            if user_ids is not None:
+                rows = rows.filter(user_id__in=user_ids)
+            rows.delete()
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for (user_id, ingredient_id), amount
+                    in self.expected(user_ids).items()
+                ),
+                batch_size=1000,
+            )
+
+
+class ShoppingListIngredient(models.Model):
+    """Модель суммарного количества ингредиента в списке покупок.
+
+    Строки пересчитываются при изменении списка покупок и ингредиентов
+    рецептов, поэтому выгрузка списка не требует агрегации.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_lists',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    objects = ShoppingListManager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        ordering = ['user']
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_ingredient',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient.name}'
+
+
+class UserStatsManager(CountersManager):
+
+    def recount(self, pks=None):
+        """Создаёт недостающие записи и пересчитывает счётчики."""
+        users = User.objects.all()
+        if pks is not None:
+            users = users.filter(pk__in=pks)
+        self.bulk_create(
+            (self.model(user_id=pk) for pk in users.values_list(
+                'pk', flat=True
+            ).iterator()),
+            ignore_conflicts=True,
+        )
+        return super().recount(pks)
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при изменении данных."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+
+    objects = UserStatsManager()
+
+    COUNTERS = {
+        'recipes_count': ('recipes.Recipe', 'author'),
+        'followers_count': ('recipes.Follow', 'author'),
+    }
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
@@ -0,0 +1,99 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .models import (Favorite, Follow, Ingredient, Recipe, RecipeIngredient,
+                     RecipeTag, ShoppingCart, ShoppingListIngredient, Tag,
+                     User)
+from .tasks import create_image_derivatives
+from .trigrams import update_trigrams
+from .versions import bump_version
+
+# Модели, версия данных которых используется кешами.
+VERSIONED_MODELS = (Ingredient, Recipe, Tag, User)
+# Модели, записи которых удаляются каскадно вместе с записью ключа.
+# Обработчиков удаления у них нет, чтобы Django удалял их одним
+# запросом; при прямых изменениях версию меняет api.utils.
+CASCADE_VERSIONS = {
+    Recipe: (Favorite, ShoppingCart, RecipeTag, RecipeIngredient),
+    Tag: (RecipeTag,),
+    User: (Follow, Favorite, ShoppingCart),
+}
+# Поля, которые не попадают в ответы API: их изменение версию не меняет.
+# last_login обновляется при каждом входе по токену.
+UNVERSIONED_FIELDS = {
+    User: frozenset({'last_login'}),
+}
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    """Перед удалением рецепта вычитает его ингредиенты из списков покупок
+    пользователей, добавивших рецепт в корзину.
+    """
+    Recipe.objects.lock(instance.pk)
+    ShoppingListIngredient.objects.remove_recipe_for_users(
+        ShoppingCart.objects.filter(recipe=instance).values_list(
+            'user_id', flat=True
+        ),
+        instance,
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def mark_new_image(sender, instance, **kwargs):
+    """Новый файл ещё не сохранён в хранилище до вызова pre_save поля."""
+    instance._image_changed = bool(
+        instance.image and not instance.image._committed
+    )
+    if instance._image_changed:
+        instance.has_image_derivatives = False
+
+
+@receiver(post_save, sender=Recipe)
+def queue_image_derivatives(sender, instance, **kwargs):
+    if getattr(instance, '_image_changed', False):
+        instance._image_changed = False
+        create_image_derivatives.delay(instance.pk, instance.image.name)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_trigrams(sender, instance, using, **kwargs):
+    update_trigrams([instance], using)
+
+
+def bump_model_version(sender, update_fields=None, **kwargs):
+    if update_fields and update_fields <= UNVERSIONED_FIELDS.get(
+        sender, frozenset()
+    ):
+        return
+    bump_version(sender)
+
+
+def bump_cascade_versions(sender, **kwargs):
+    bump_version(sender, *CASCADE_VERSIONS.get(sender, ()))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if reverse and action == 'pre_clear':
+        Recipe.objects.touch(instance.recipes.values('pk'))
+    if not action.startswith('post_'):
+        return
+    bump_version(RecipeTag)
+    if not reverse:
+        Recipe.objects.touch([instance.pk])
+    elif pk_set:
+        Recipe.objects.touch(pk_set)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    bump_version(RecipeIngredient)
+    Recipe.objects.touch([instance.recipe_id])
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model)
+    post_delete.connect(bump_cascade_versions, sender=model)
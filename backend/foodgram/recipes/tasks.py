@@ -0,0 +1,25 @@
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .images import create_derivatives, derivative_names
+from .models import Recipe
+from .versions import bump_version
+from tasks.queue import task
+
+
+@task
+def delete_image(name):
+    """Удаляет изображение рецепта вместе с уменьшенными копиями.
+    Уже отсутствующие файлы пропускаются.
+    """
+    for path in [name, *derivative_names(name)]:
+        default_storage.delete(path)
+
+
+@task
+def create_image_derivatives(recipe_id, name):
+    create_derivatives(name)
+    Recipe.objects.filter(id=recipe_id, image=name).update(
+        has_image_derivatives=True, updated=timezone.now()
+    )
+    bump_version(Recipe)
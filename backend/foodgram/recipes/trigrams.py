@@ -0,0 +1,82 @@
+"""Триграммы названий ингредиентов для нечёткого поиска.
+
+На PostgreSQL поиск использует расширение pg_trgm и GIN-индекс, таблица
+IngredientTrigram заполняется только на остальных СУБД. Разбиение на
+триграммы повторяет pg_trgm: слова в нижнем регистре дополняются двумя
+пробелами в начале и одним в конце.
+"""
+import re
+
+from django.db import connections
+
+WORD_RE = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Множество триграмм строки."""
+    grams = set()
+    for word in WORD_RE.findall(text.casefold()):
+        padded = f'  {word} '
+        grams.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return grams
+
+
+def similarity(first, second):
+    """Доля общих триграмм, как similarity() в pg_trgm."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def uses_pg_trgm(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def insert_trigrams(rows, using='default'):
+    """Вставляет пары (id ингредиента, название) в таблицу триграмм.
+
+    Используется executemany без создания объектов модели: для больших
+    каталогов строк в таблице на порядок больше, чем ингредиентов.
+    """
+    from .models import IngredientTrigram
+
+    table = IngredientTrigram._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (ingredient_id, trigram) VALUES (%s, %s)',
+            (
+                (ingredient_id, trigram)
+                for ingredient_id, name in rows
+                for trigram in trigrams(name)
+            ),
+        )
+
+
+def update_trigrams(ingredients, using='default'):
+    """Пересчитывает триграммы для переданных ингредиентов."""
+    from .models import IngredientTrigram
+
+    if uses_pg_trgm(using):
+        return
+    ingredients = list(ingredients)
+    IngredientTrigram.objects.using(using).filter(
+        ingredient__in=ingredients
+    ).delete()
+    insert_trigrams(
+        ((ingredient.pk, ingredient.name) for ingredient in ingredients),
+        using,
+    )
+
+
+def rebuild_trigrams(using='default'):
+    """Заполняет таблицу триграмм заново для всего каталога."""
+    from .models import Ingredient, IngredientTrigram
+
+    if uses_pg_trgm(using):
+        return
+    IngredientTrigram.objects.using(using).all().delete()
+    insert_trigrams(
+        Ingredient.objects.using(using).values_list('id', 'name'), using
+    )
@@ -0,0 +1,66 @@
+"""Версии данных моделей для инвалидации кешей.
+
+Версия хранится в общем кеше Django state, поэтому её видят все процессы.
+Кеш отдельный от кеша ответов, чтобы версии не вытеснялись вместе с
+ответами.
+При изменении данных версия заменяется новым случайным значением, а не
+увеличивается: так параллельные изменения не могут дать одинаковую
+версию, и потеря ключа при вытеснении не возвращает старое значение.
+В начале версии записано время её создания, по нему строится заголовок
+Last-Modified (см. version_time).
+"""
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'data-version'
+
+
+def version_key(model):
+    return f'{KEY_PREFIX}:{model._meta.label_lower}'
+
+
+def new_version():
+    return f'{time.time():.6f}:{uuid.uuid4().hex}'
+
+
+def version_time(version):
+    """Время создания версии; для версий старого формата - None."""
+    created, separator, _ = version.partition(':')
+    if not separator:
+        return None
+    try:
+        return datetime.fromtimestamp(float(created), timezone.utc)
+    except ValueError:
+        return None
+
+
+def get_versions(*models):
+    """Текущие версии моделей в порядке их перечисления."""
+    keys = [version_key(model) for model in models]
+    cache = caches['state']
+    versions = cache.get_many(keys)
+    missing = {
+        key: new_version() for key in keys if key not in versions
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def get_version(model):
+    return get_versions(model)[0]
+
+
+def bump_version(*models):
+    """Меняет версии моделей после фиксации текущей транзакции."""
+    def bump():
+        caches['state'].set_many(
+            {version_key(model): new_version() for model in models},
+            timeout=None,
+        )
+    transaction.on_commit(bump)
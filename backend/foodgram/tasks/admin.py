@@ -0,0 +1,23 @@
+from django.contrib import admin
+
+from tasks.models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    """Класс для работы с фоновыми задачами в админ-панели."""
+
+    list_display = (
+        'id', 'name', 'status', 'attempts', 'run_at', 'locked_by',
+    )
+    list_filter = ('status', 'name')
+    readonly_fields = ('created', 'locked_at', 'locked_by', 'last_error')
+    actions = ('requeue',)
+
+    @admin.action(description='Вернуть в очередь')
+    def requeue(self, request, queryset):
+        queryset.update(
+            status=Task.QUEUED, attempts=0, locked_at=None, locked_by=''
+        )
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,59 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Обработчик фоновых задач из очереди в БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.TASK_WORKER_CONCURRENCY,
+            help='Количество потоков',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза между проверками пустой очереди, с',
+        )
+        parser.add_argument(
+            '--lock-timeout', type=int, default=300,
+            help='Через сколько секунд задача зависшего обработчика '
+                 'выполняется заново',
+        )
+        parser.add_argument(
+            '--backoff', type=int, default=settings.TASK_RETRY_BACKOFF,
+            help='Задержка перед первым повтором, с; удваивается с каждой '
+                 'попыткой',
+        )
+        parser.add_argument(
+            '--max-backoff', type=int, default=settings.TASK_MAX_BACKOFF,
+            help='Максимальная задержка перед повтором, с',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write('Завершение после текущих задач...')
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            lock_timeout=options['lock_timeout'],
+            backoff=options['backoff'],
+            max_backoff=options['max_backoff'],
+            log=self.stdout.write,
+        )
+        worker.run(stop, once=options['once'])
@@ -0,0 +1,45 @@
+"""Очередь фоновых задач в таблице БД.
+
+Задача - функция модуля tasks.py любого приложения, обёрнутая
+декоратором task. Вызов func.delay(*args) добавляет строку в таблицу
+Task в текущей транзакции: если транзакция откатится, задачи не
+будет, а обработчик увидит её только после фиксации. Аргументы должны
+сериализоваться в JSON.
+"""
+from django.conf import settings
+
+from .models import Task
+
+registry = {}
+
+
+class TaskFunction:
+
+    def __init__(self, func, max_attempts):
+        self.func = func
+        self.name = f'{func.__module__}.{func.__qualname__}'
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def delay(self, *args):
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            max_attempts=self.max_attempts,
+        )
+
+
+def task(func=None, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу."""
+    def register(func):
+        task_function = TaskFunction(
+            func, max_attempts or settings.TASK_MAX_ATTEMPTS
+        )
+        registry[task_function.name] = task_function
+        return task_function
+
+    if func is not None:
+        return register(func)
+    return register
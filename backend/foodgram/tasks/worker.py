@@ -0,0 +1,154 @@
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+from .queue import registry
+
+
+class Worker:
+    """Выполняет задачи из таблицы Task в нескольких потоках.
+
+    Задача забирается условным UPDATE, который проходит только у одного
+    обработчика; на PostgreSQL кандидаты дополнительно выбираются с
+    FOR UPDATE SKIP LOCKED, чтобы обработчики не ждали друг друга.
+    Успешно выполненная задача удаляется. После ошибки задача
+    возвращается в очередь с экспоненциально растущей задержкой, а после
+    max_attempts попыток остаётся в таблице со статусом failed. Задача,
+    взятая обработчиком, который не ответил за lock_timeout секунд,
+    считается брошенной и выполняется заново. Ошибка БД (например,
+    database is locked в SQLite или разрыв соединения) записывается в
+    журнал, соединение потока закрывается, и поток повторяет попытку с
+    растущей задержкой; задача, взятая до ошибки, выполнится заново после
+    lock_timeout.
+    """
+
+    def __init__(self, concurrency=1, poll_interval=1.0, lock_timeout=300,
+                 backoff=10, max_backoff=3600, log=print):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lock_timeout = lock_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.log = log
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+
+    def available(self, now):
+        return Task.objects.filter(
+            Q(status=Task.QUEUED, run_at__lte=now)
+            | Q(
+                status=Task.RUNNING,
+                locked_at__lt=now - timedelta(seconds=self.lock_timeout),
+            )
+        )
+
+    def claim(self, worker_name):
+        """Забирает одну готовую к выполнению задачу или возвращает None."""
+        now = timezone.now()
+        with transaction.atomic():
+            for pk in self.available(now).select_for_update(
+                skip_locked=True
+            ).values_list('id', flat=True)[:self.concurrency]:
+                claimed = self.available(now).filter(pk=pk).update(
+                    status=Task.RUNNING,
+                    locked_at=now,
+                    locked_by=worker_name,
+                    attempts=F('attempts') + 1,
+                )
+                if claimed:
+                    return Task.objects.get(pk=pk)
+        return None
+
+    def retry_delay(self, attempts):
+        return timedelta(
+            seconds=min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        )
+
+    def execute(self, task):
+        task_function = registry.get(task.name)
+        try:
+            if task_function is None:
+                raise LookupError(f'Неизвестная задача {task.name}')
+            task_function(*task.args)
+        except Exception:
+            self.fail(task, traceback.format_exc())
+            return
+        Task.objects.filter(pk=task.pk, locked_by=task.locked_by).delete()
+        self.log(f'{task.name} #{task.pk}: выполнена')
+
+    def fail(self, task, error):
+        queryset = Task.objects.filter(pk=task.pk, locked_by=task.locked_by)
+        if task.attempts >= task.max_attempts:
+            queryset.update(status=Task.FAILED, last_error=error)
+            self.log(
+                f'{task.name} #{task.pk}: ошибка, попытки исчерпаны\n{error}'
+            )
+            return
+        delay = self.retry_delay(task.attempts)
+        queryset.update(
+            status=Task.QUEUED,
+            run_at=timezone.now() + delay,
+            locked_at=None,
+            locked_by='',
+            last_error=error,
+        )
+        self.log(
+            f'{task.name} #{task.pk}: ошибка, повтор через '
+            f'{delay.total_seconds():.0f} с\n{error}'
+        )
+
+    def database_error(self, worker_name, failures, stop):
+        """Закрывает соединение после ошибки БД и ждёт перед следующей
+        попыткой.
+        """
+        delay = min(self.poll_interval * 2 ** (failures - 1), self.max_backoff)
+        self.log(
+            f'{worker_name}: ошибка БД, повтор через {delay:.1f} с\n'
+            f'{traceback.format_exc()}'
+        )
+        connection.close()
+        stop.wait(delay)
+
+    def work(self, number, stop, once):
+        worker_name = f'{self.name}:{number}'
+        failures = 0
+        try:
+            while not stop.is_set():
+                try:
+                    task = self.claim(worker_name)
+                    if task is not None:
+                        self.execute(task)
+                except DatabaseError:
+                    failures += 1
+                    self.database_error(worker_name, failures, stop)
+                    continue
+                failures = 0
+                if task is not None:
+                    continue
+                if once:
+                    return
+                stop.wait(self.poll_interval)
+        finally:
+            connection.close()
+
+    def run(self, stop=None, once=False):
+        """Запускает потоки и ждёт их завершения.
+
+        Потоки останавливаются после выставления stop, а при once=True -
+        как только в очереди не остаётся готовых задач.
+        """
+        stop = stop or threading.Event()
+        threads = [
+            threading.Thread(target=self.work, args=(number, stop, once))
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()